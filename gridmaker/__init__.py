@@ -0,0 +1,10 @@
+"""
+Grid Maker image pipeline.
+
+Everything needed to render and batch-process images lives here, without any
+tkinter/customtkinter dependency, so it can run in worker processes.
+"""
+
+from .settings import RenderSettings
+from .pipeline import SUPPORTED_FORMATS, list_images, process_image, render_image
+from .batch import BACKENDS, BatchError, BatchResult, plan_batch, run_batch
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from PIL import Image
+
+from .palette import PixelReservoir, palette_hex, parse_palette, read_cache_file, solve_palette, write_cache_file
+from .pipeline import list_images, output_filename, pixel_cells, process_image, unique_path
+from .pixelart import palette_colors
+
+# Available worker pool backends
+BACKENDS = ("thread", "process")
+DEFAULT_BACKEND = "thread"
+
+# 0 = one worker per CPU core
+DEFAULT_WORKERS = 0
+
+# Each queued file costs an open handle and (for processes) a pickled settings copy,
+# so only keep a few jobs per worker in flight. This also keeps Stop responsive.
+JOBS_PER_WORKER = 2
+
+# Shared palette: files sampled (spread evenly over the batch) and pixels kept from them
+SHARED_PALETTE_FILES = 32
+SHARED_PALETTE_PIXELS = 65536
+
+# Settings that change the sampled pixel art cells or how their palette is solved
+SHARED_PALETTE_KEYS = (
+    "h_padding",
+    "v_padding",
+    "zoom_factor",
+    "pixel_art_scale",
+    "pixel_art_downsample",
+    "pixel_art_palette",
+    "pixel_art_quantizer",
+)
+
+# Shared palettes solved in this process, by cache key
+_shared_palettes = {}
+
+BatchJob = namedtuple("BatchJob", ["filename", "input_path", "output_path"])
+BatchResult = namedtuple("BatchResult", ["done", "total", "stopped"])
+
+
+class BatchError(Exception):
+    """Raised when a single file of the batch fails; carries the offending file name."""
+
+    def __init__(self, filename, error):
+        super().__init__(f"Error processing {filename}: {error}")
+        self.filename = filename
+        self.error = error
+
+
+def resolve_workers(workers):
+    """Returns the worker count to use (0 or less means one worker per CPU core)."""
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        workers = 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def plan_batch(folder_path, output_dir):
+    """
+    Lists the supported images in folder_path and assigns each a unique output path.
+    Names are handed out up front so parallel workers never race for the same file name.
+    """
+    jobs = []
+    reserved = set()
+    for filename in list_images(folder_path):
+        output_path = unique_path(os.path.join(output_dir, output_filename(filename)), reserved)
+        reserved.add(output_path)
+        jobs.append(BatchJob(filename, os.path.join(folder_path, filename), output_path))
+    return jobs
+
+
+def uses_shared_palette(settings):
+    """True when the settings ask for one adaptive (16/32/64) palette for the whole batch."""
+    return bool(
+        settings.pixel_art_enabled
+        and settings.pixel_art_shared_palette
+        and parse_palette(settings.pixel_art_palette) is None
+        and palette_colors(settings.pixel_art_palette) is not None
+    )
+
+
+def _shared_palette_key(paths, settings):
+    """Cache key: the sampled files (path, size, mtime) and the settings that shape their cells."""
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            files.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            files.append((os.path.abspath(path), None, None))
+    values = [getattr(settings, key) for key in SHARED_PALETTE_KEYS]
+    return hashlib.sha1(repr((files, values)).encode()).hexdigest()[:20]
+
+
+def _sample_cells(input_path, settings):
+    """pixel_cells for a shared palette sample, or None when the file cannot be decoded."""
+    try:
+        return pixel_cells(input_path, settings)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # A broken file is skipped here; the batch reports it (with its name) when rendering it
+        return None
+
+
+def shared_palette(paths, settings, map_func=map, should_stop=None):
+    """
+    Resolves the "shared palette" batch mode: samples the pixel art cells of up to
+    SHARED_PALETTE_FILES images spread over the batch into a reservoir, solves the
+    adaptive palette once and returns settings with that palette as a fixed
+    pixel_art_palette (a hex list), so every file maps to the same colors without a
+    palette solve of its own. Solved palettes are cached in memory and on disk.
+    Sampled files that cannot be decoded are skipped.
+
+    :param paths: Input files of the batch (in batch order).
+    :param map_func: map-like callable used to decode the samples (e.g. executor.map).
+    :return: the settings to render the batch with (unchanged when the mode is off).
+    """
+    if not uses_shared_palette(settings) or not paths:
+        return settings
+
+    count = min(SHARED_PALETTE_FILES, len(paths))
+    sample = [paths[i * len(paths) // count] for i in range(count)]
+    key = _shared_palette_key(sample, settings)
+
+    colors = _shared_palettes.get(key)
+    if colors is None:
+        cached = read_cache_file(f"palette-{key}.json")
+        if cached:
+            try:
+                colors = tuple(tuple(color) for color in json.loads(cached))
+            except ValueError:
+                colors = None
+
+    if colors is None:
+        reservoir = PixelReservoir(SHARED_PALETTE_PIXELS)
+        for cells in map_func(_sample_cells, sample, repeat(settings)):
+            if should_stop and should_stop():
+                return settings
+            if cells is not None:
+                reservoir.add(cells)
+        pixels = reservoir.image()
+        if pixels is None:
+            return settings
+        colors = solve_palette(pixels, palette_colors(settings.pixel_art_palette), settings.pixel_art_quantizer)
+        write_cache_file(f"palette-{key}.json", json.dumps(colors).encode())
+
+    _shared_palettes[key] = colors
+    return settings.replace(pixel_art_palette=palette_hex(colors))
+
+
+def _make_executor(backend, workers):
+    if backend == "process":
+        # Always spawn: forking a process that runs a Tk mainloop is not safe
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gridmaker")
+
+
+def run_batch(jobs, settings, workers=DEFAULT_WORKERS, backend=DEFAULT_BACKEND, progress=None, should_stop=None):
+    """
+    Processes all jobs on a pool of workers.
+
+    :param jobs: List of BatchJob (see plan_batch).
+    :param settings: RenderSettings snapshot passed to every process_image call (with the
+                     batch palette filled in first when a shared palette is requested).
+    :param workers: Worker count (0 = one per CPU core).
+    :param backend: "thread" (Pillow releases the GIL in resize/quantize/encode) or "process".
+    :param progress: Optional callback(done, total), called from the calling thread.
+    :param should_stop: Optional callable; when it returns True no new files are started.
+    :return: BatchResult(done, total, stopped)
+    :raises BatchError: on the first file that fails (remaining queued files are cancelled),
+                        or when a process worker dies (BrokenProcessPool).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown batch backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+    total = len(jobs)
+    if total == 0:
+        return BatchResult(0, 0, False)
+
+    workers = min(resolve_workers(workers), total)
+    max_in_flight = workers * JOBS_PER_WORKER
+    pending_jobs = iter(jobs)
+    in_flight = {}
+    done = 0
+    stopped = False
+
+    executor = _make_executor(backend, workers)
+    try:
+        # Solve the shared palette once (sampling on the same pool) before any file is rendered
+        try:
+            settings = shared_palette([job.input_path for job in jobs], settings, executor.map, should_stop)
+        except BrokenProcessPool as e:
+            raise BatchError("the shared palette samples", e) from e
+
+        while True:
+            if should_stop and should_stop():
+                stopped = True
+                break
+
+            # Top up the pool
+            while len(in_flight) < max_in_flight:
+                job = next(pending_jobs, None)
+                if job is None:
+                    break
+                try:
+                    future = executor.submit(process_image, job.input_path, job.output_path, settings)
+                except BrokenProcessPool as e:
+                    # A worker died while earlier files were running; the pool takes no more jobs
+                    raise BatchError(job.filename, e) from e
+                in_flight[future] = job
+
+            if not in_flight:
+                break
+
+            # Wake up periodically so a Stop request is noticed even while files are slow
+            finished, _ = wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = in_flight.pop(future)
+                error = future.exception()
+                if error is not None:
+                    raise BatchError(job.filename, error) from error
+                done += 1
+                if progress:
+                    progress(done, total)
+    finally:
+        # Files already being processed are allowed to finish; queued ones are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return BatchResult(done, total, stopped)
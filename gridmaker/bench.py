@@ -0,0 +1,248 @@
+"""
+Micro-benchmarks for individual pipeline stages.
+
+    python -m gridmaker bench SUITE [--size WxH] [--repeat N] [--image PATH]
+
+Each suite times the current implementation against the approach it replaced
+(or against the alternatives it offers) on the same input and prints one line per
+variant. Inputs are synthetic and seeded, so numbers are comparable between runs.
+"""
+
+import math
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .grid import GRID_MASKS, draw_grid
+from .dither import ERROR_KERNELS, ORDERED_MATRICES, error_diffuse, error_kernel, ordered_dither, threshold_matrix
+from .pipeline import render_image
+from .palette import available_quantizers, build_lut, map_to_palette, palette_image, palette_lut, parse_palette, quantize
+from .pixelart import DOWNSAMPLE_MODES, downsample_filter, downscale, pixel_geometry
+from .plan import compile_plan
+from .settings import RenderSettings
+
+
+def sample_image(width, height, seed=0):
+    """Deterministic photo-like test image: smooth gradients plus a little noise."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(width, dtype=np.float32)
+    y = np.arange(height, dtype=np.float32)[:, None]
+
+    arr = np.empty((height, width, 3), dtype=np.uint8)
+    arr[..., 0] = 127 + 120 * np.sin(x / width * 6.0)
+    arr[..., 1] = 127 + 120 * np.cos(y / height * 5.0)
+    arr[..., 2] = 127 + 120 * np.sin((x + y) / (width + height) * 9.0)
+
+    # Tile a small noise block instead of drawing noise for every pixel (keeps memory flat)
+    noise = rng.integers(0, 24, size=(min(height, 251), min(width, 257), 3), dtype=np.uint8)
+    for top in range(0, height, noise.shape[0]):
+        for left in range(0, width, noise.shape[1]):
+            block = arr[top : top + noise.shape[0], left : left + noise.shape[1]]
+            np.subtract(block, np.minimum(block, noise[: block.shape[0], : block.shape[1]]), out=block)
+    return Image.fromarray(arr)
+
+
+def load_input(args):
+    """The --image file (RGB) if given, otherwise a synthetic image of --size."""
+    if args.image:
+        with Image.open(args.image) as src:
+            return src.convert("RGB")
+    return sample_image(*args.size)
+
+
+def timeit(fn, repeat):
+    """Runs fn 'repeat' times and returns (best seconds, last result)."""
+    best = math.inf
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(name, seconds, baseline=None, note=""):
+    line = f"  {name:<28} {seconds * 1000:10.1f} ms"
+    if baseline:
+        line += f"   x{baseline / seconds:6.1f}"
+    if note:
+        line += f"   {note}"
+    print(line)
+
+
+def _draw_grid_imagedraw(img, rows, cols, color, thickness, highlight_every):
+    """Previous grid renderer: one ImageDraw.line call per row and per column."""
+    width, height = img.size
+    draw = ImageDraw.Draw(img)
+    cell_size = max(width / cols, height / rows)
+    cols_needed = int(math.ceil(width / cell_size))
+    rows_needed = int(math.ceil(height / cell_size))
+
+    for r in range(rows_needed + 1):
+        y = r * cell_size if r < rows_needed else height
+        w = thickness + (1 if highlight_every and r % highlight_every == 0 else 0)
+        draw.line([(0, y), (width, y)], fill=color, width=w)
+    for c in range(cols_needed + 1):
+        x = c * cell_size if c < cols_needed else width
+        w = thickness + (1 if highlight_every and c % highlight_every == 0 else 0)
+        draw.line([(x, 0), (x, height)], fill=color, width=w)
+    return img
+
+
+def bench_grid(args):
+    img = load_input(args)
+    rows, highlight = args.rows, 10
+    print(f"grid overlay: {img.width}x{img.height}, {rows} cells, highlight every {highlight} (times include a copy)")
+
+    for thickness in (1, 3):
+        print(f" thickness {thickness}")
+        legacy_time, legacy = timeit(
+            lambda: _draw_grid_imagedraw(img.copy(), rows, rows, "#000000", thickness, highlight), args.repeat
+        )
+
+        def cold():
+            GRID_MASKS.clear()
+            return draw_grid(img.copy(), rows, rows, "#000000", thickness, highlight)
+
+        cold_time, current = timeit(cold, args.repeat)
+        cached_time, _ = timeit(lambda: draw_grid(img.copy(), rows, rows, "#000000", thickness, highlight), args.repeat)
+
+        identical = np.array_equal(np.asarray(legacy), np.asarray(current))
+        report("ImageDraw lines", legacy_time)
+        report("NumPy mask (first image)", cold_time, legacy_time, "identical" if identical else "DIFFERENT OUTPUT")
+        report("cached mask paste", cached_time, legacy_time)
+
+
+def bench_pixelart(args):
+    img = load_input(args)
+    base = RenderSettings(grid_enabled=False, zoom_factor=args.zoom, pixel_art_scale=args.scale)
+    print(f"pixel art: {img.width}x{img.height}, zoom {args.zoom}, scale {args.scale} (no grid, no palette)")
+
+    for mode in DOWNSAMPLE_MODES:
+        settings = base.replace(pixel_art_downsample=mode)
+        plan = compile_plan(settings, img.size, img.mode)
+        seconds, _ = timeit(lambda: render_image(img, settings), args.repeat)
+        if mode == "Nearest":
+            baseline = seconds
+        steps = " + ".join(type(step).__name__ for step in plan.steps)
+        report(f"{mode} ({steps})", seconds, baseline if mode != "Nearest" else None)
+
+    geometry = pixel_geometry(img.size, args.scale)
+    left, top, right, bottom = geometry.box
+    small_w, small_h = geometry.small
+    print(f" cells only: {img.width}x{img.height} -> {small_w}x{small_h}")
+    for mode in DOWNSAMPLE_MODES:
+        resample = downsample_filter(mode)
+        seconds, _ = timeit(lambda: downscale(img, geometry.small, geometry.box, resample), args.repeat)
+        report(mode, seconds)
+
+    def numpy_mean():
+        blocks = np.asarray(img)[top:bottom, left:right].reshape(small_h, args.scale, small_w, args.scale, 3)
+        return Image.fromarray(blocks.mean(axis=(1, 3)).round().astype(np.uint8))
+
+    reduce_time, _ = timeit(lambda: downscale(img, geometry.small, geometry.box, Image.Resampling.BOX), args.repeat)
+    box_time, _ = timeit(lambda: img.resize(geometry.small, Image.Resampling.BOX, box=geometry.box), args.repeat)
+    numpy_time, _ = timeit(numpy_mean, args.repeat)
+    print(" average alternatives")
+    report("resize(BOX)", box_time, None)
+    report("NumPy reshape-mean", numpy_time, None)
+    report("Image.reduce (used)", reduce_time, box_time)
+
+
+def bench_palette(args):
+    img = load_input(args)
+    small = img.resize((img.width // args.scale, img.height // args.scale), Image.Resampling.BOX)
+    rng = np.random.default_rng(0)
+    palettes = {
+        "Game Boy (4)": parse_palette("Game Boy"),
+        "random 64": tuple(map(tuple, rng.integers(0, 256, (64, 3)).tolist())),
+        "random 256": tuple(map(tuple, rng.integers(0, 256, (256, 3)).tolist())),
+    }
+    print(f"fixed palette mapping: {small.width}x{small.height} cells (scale {args.scale})")
+
+    for name, colors in palettes.items():
+        print(f" {name}")
+        search_time, _ = timeit(lambda: small.quantize(palette=palette_image(colors), dither=Image.Dither.NONE), args.repeat)
+        palette_lut.cache_clear()
+        build_time, _ = timeit(lambda: build_lut(colors), 1)
+        lab_build_time, _ = timeit(lambda: build_lut(colors, metric="lab"), 1)
+        palette_lut(colors)
+        palette_lut(colors, metric="lab")
+        lut_time, _ = timeit(lambda: map_to_palette(small, colors), args.repeat)
+        lab_time, _ = timeit(lambda: map_to_palette(small, colors, "lab"), args.repeat)
+        report("quantize(palette=...)", search_time)
+        report("LUT build (once, cached)", build_time)
+        report("LUT gather", lut_time, search_time)
+        report("Lab LUT build (once, cached)", lab_build_time)
+        report("Lab LUT gather", lab_time, search_time)
+
+
+def mean_color_error(original, quantized):
+    """Mean RGB (Euclidean) distance between an image and its palette-reduced version."""
+    a = np.asarray(original, dtype=np.float32)
+    b = np.asarray(quantized.convert("RGB"), dtype=np.float32)
+    return float(np.sqrt(((a - b) ** 2).sum(axis=2)).mean())
+
+
+def bench_quantize(args):
+    # Fixed image set: --image, or three seeded synthetic images of --size
+    if args.image:
+        images = [load_input(args)]
+    else:
+        images = [sample_image(*args.size, seed=seed) for seed in range(3)]
+    cells = [img.resize((img.width // args.scale, img.height // args.scale), Image.Resampling.BOX) for img in images]
+    print(
+        f"adaptive palettes: {len(cells)} image(s) of {cells[0].width}x{cells[0].height} cells (scale {args.scale}),"
+        " time summed over the set, error = mean RGB distance"
+    )
+
+    for colors in (16, 64):
+        print(f" {colors} colors")
+        for i, name in enumerate(available_quantizers()):
+            seconds = 0.0
+            errors = []
+            for small in cells:
+                elapsed, result = timeit(lambda: quantize(small, colors, name), args.repeat)
+                seconds += elapsed
+                errors.append(mean_color_error(small, result))
+            if i == 0:
+                baseline = seconds
+            report(name, seconds, baseline if i else None, f"error {sum(errors) / len(errors):5.2f}")
+
+
+def bench_dither(args):
+    img = load_input(args)
+    small = img.resize((img.width // args.scale, img.height // args.scale), Image.Resampling.BOX)
+    colors = parse_palette("Game Boy")
+    palette_lut(colors)
+    print(f"dithering against Game Boy: {small.width}x{small.height} cells (scale {args.scale})")
+
+    def web_detour():
+        # Previous "Ordered": web palette ordered dither, back to RGB, then map to the palette
+        return map_to_palette(small.convert("P", dither=Image.Dither.ORDERED).convert("RGB"), colors)
+
+    legacy_time, _ = timeit(web_detour, args.repeat)
+    report("web palette detour", legacy_time)
+    for option in ORDERED_MATRICES:
+        matrix = threshold_matrix(option)
+        seconds, _ = timeit(lambda: ordered_dither(small, colors, matrix, lambda i: map_to_palette(i, colors)), args.repeat)
+        report(f"{option} (one pass)", seconds, legacy_time)
+
+    print(" error diffusion (x = Pillow Floyd time / kernel time)")
+    lut = palette_lut(colors)
+    floyd_time, _ = timeit(lambda: small.quantize(palette=palette_image(colors), dither=Image.Dither.FLOYDSTEINBERG), args.repeat)
+    report("Pillow Floyd-Steinberg", floyd_time)
+    for option in ERROR_KERNELS:
+        kernel = error_kernel(option)
+        seconds, _ = timeit(lambda: error_diffuse(small, colors, kernel, lut), args.repeat)
+        report(f"{option} (wavefront)", seconds, floyd_time)
+
+
+SUITES = {
+    "dither": bench_dither,
+    "grid": bench_grid,
+    "pixelart": bench_pixelart,
+    "palette": bench_palette,
+    "quantize": bench_quantize,
+}
@@ -0,0 +1,195 @@
+"""
+Headless command-line interface.
+
+    python -m gridmaker render IN_DIR [OUT_DIR] [--config config.json] [--set key=value ...] [--explain]
+    python -m gridmaker bench SUITE [--size WxH] [--repeat N]
+
+Runs the same trim → zoom → pixel art → grid → numbers pipeline as the GUI, using the
+same config keys, without loading tkinter, opening a window or taking the
+single-instance lock.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+from .batch import BACKENDS, DEFAULT_BACKEND, DEFAULT_WORKERS, BatchError, plan_batch, run_batch
+from .bench import SUITES
+from .pipeline import output_format
+from .plan import compile_plan
+from .settings import RenderSettings
+
+
+def load_config(path):
+    """Reads a JSON config file (same layout as the GUI's config.json)."""
+    with open(path, "r") as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    return config
+
+
+def parse_overrides(pairs):
+    """Turns ["key=value", ...] into a dictionary, rejecting unknown setting names."""
+    known = set(RenderSettings().to_dict())
+    overrides = {}
+    for pair in pairs or ():
+        key, sep, value = pair.partition("=")
+        key = key.strip()
+        if not sep or not key:
+            raise ValueError(f"Invalid --set value {pair!r} (expected key=value)")
+        if key not in known:
+            raise ValueError(f"Unknown setting {key!r}")
+        overrides[key] = value.strip()
+    return overrides
+
+
+def build_settings(args):
+    """Combines defaults, the --config file and --set overrides into (RenderSettings, config dict)."""
+    config = load_config(args.config) if args.config else {}
+    # --backend is checked by argparse; a config value is only checked here
+    if args.backend is None and config.get("batch_backend", DEFAULT_BACKEND) not in BACKENDS:
+        raise ValueError(
+            f"{args.config}: unknown batch_backend {config['batch_backend']!r} (expected one of {', '.join(BACKENDS)})"
+        )
+    values = dict(config)
+    values.update(parse_overrides(args.set))
+    return RenderSettings.from_mapping(values), config
+
+
+def _print_progress(done, total):
+    percentage = int(done / total * 100)
+    print(f"\r[{done}/{total}] {percentage}%", end="", file=sys.stderr, flush=True)
+
+
+def explain(jobs, settings):
+    """
+    Prints the compiled render plan once per distinct input size and mode.
+    Only the image headers are read; nothing is decoded or written.
+    """
+    groups = {}
+    for job in jobs:
+        try:
+            with Image.open(job.input_path) as src:
+                key = (src.size, src.mode, output_format(job.output_path) == "PNG")
+        except OSError as e:
+            print(f"{job.filename}: {e}", file=sys.stderr)
+            continue
+        groups.setdefault(key, []).append(job.filename)
+
+    for (size, mode, indexed), names in groups.items():
+        plan = compile_plan(settings, size, mode, indexed)
+        files = names[0] if len(names) == 1 else f"{len(names)} files, e.g. {names[0]}"
+        print(f"{plan.explain()}\n  ({files})\n")
+
+
+def cmd_render(args):
+    in_dir = args.in_dir
+    if not os.path.isdir(in_dir):
+        print(f"Error: {in_dir} is not a valid directory.", file=sys.stderr)
+        return 2
+
+    try:
+        settings, config = build_settings(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    workers = args.workers if args.workers is not None else config.get("batch_workers", DEFAULT_WORKERS)
+    backend = args.backend or config.get("batch_backend", DEFAULT_BACKEND)
+
+    out_dir = os.path.normpath(args.out_dir or os.path.join(in_dir, "output"))
+    if not args.explain:
+        os.makedirs(out_dir, exist_ok=True)
+
+    jobs = plan_batch(in_dir, out_dir)
+    if not jobs:
+        print("No supported images found in the input folder.", file=sys.stderr)
+        return 1
+
+    if args.explain:
+        explain(jobs, settings)
+        return 0
+
+    start = time.perf_counter()
+    try:
+        result = run_batch(
+            jobs,
+            settings,
+            workers=workers,
+            backend=backend,
+            progress=None if args.quiet else _print_progress,
+        )
+    except BatchError as e:
+        print(f"\n{e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\nStopped.", file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"{result.done} files saved to {out_dir} ({elapsed:.2f}s)")
+    return 0
+
+
+def parse_size(text):
+    """argparse type for WIDTHxHEIGHT."""
+    try:
+        width, height = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r} (expected WIDTHxHEIGHT)")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}")
+    return width, height
+
+
+def cmd_bench(args):
+    SUITES[args.suite](args)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gridmaker", description="Grid Maker headless batch renderer.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    render = subparsers.add_parser("render", help="Render every supported image in a folder.")
+    render.add_argument("in_dir", help="Folder containing PNG, JPG, JPEG, AVIF or WEBP images.")
+    render.add_argument("out_dir", nargs="?", help="Output folder (default: IN_DIR/output).")
+    render.add_argument("--config", help="JSON config file with the same keys as the GUI's config.json.")
+    render.add_argument(
+        "--set",
+        action="append",
+        metavar="KEY=VALUE",
+        help="Override a single setting, e.g. --set pixel_art_scale=12 (repeatable).",
+    )
+    render.add_argument("--workers", type=int, help="Worker count (0 = one per CPU core).")
+    render.add_argument("--backend", choices=BACKENDS, help="Worker pool backend.")
+    render.add_argument(
+        "--explain", action="store_true", help="Print the render plan for the inputs and exit without rendering."
+    )
+    render.add_argument("-q", "--quiet", action="store_true", help="Do not print progress.")
+    render.set_defaults(func=cmd_render)
+
+    bench = subparsers.add_parser("bench", help="Benchmark a pipeline stage.")
+    bench.add_argument("suite", choices=sorted(SUITES), help="Stage to benchmark.")
+    bench.add_argument("--size", type=parse_size, default=(4000, 3000), help="Synthetic image size (default 4000x3000).")
+    bench.add_argument("--image", help="Use this image instead of a synthetic one.")
+    bench.add_argument("--rows", type=int, default=400, help="Grid cell count (default 400).")
+    bench.add_argument("--zoom", type=float, default=0.9, help="Zoom factor (default 0.9).")
+    bench.add_argument("--scale", type=int, default=12, help="Pixel art scale (default 12).")
+    bench.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best time is reported.")
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
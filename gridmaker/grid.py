@@ -0,0 +1,136 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageColor
+
+from .palette import color_index
+
+# Grid cell count limits (same bounds as the grid rows slider)
+MIN_CELLS = 0
+MAX_CELLS = 400
+
+
+def grid_geometry(width, height, rows, cols):
+    """
+    Square cell size and the number of cells needed to cover the whole image.
+    Tries to keep cells square: the larger of width/cols and height/rows wins.
+
+    :return: (cell_size, cols_needed, rows_needed)
+    """
+    cell_size = max(width / cols, height / rows)
+    cols_needed = int(math.ceil(width / cell_size))
+    rows_needed = int(math.ceil(height / cell_size))
+    return cell_size, cols_needed, rows_needed
+
+
+def grid_count_for_pixels(small_w, small_h):
+    """
+    Grid cell count matching the pixel art dimensions.
+    Since the grid must be square (rows=cols), we select the max of the small dimensions
+    to ensure the grid covers the entire pixelated area without creating non-square cells.
+    """
+    return max(MIN_CELLS, min(MAX_CELLS, int(max(small_w, small_h))))
+
+
+def line_mask(length, count, cell_size, thickness, highlight_every):
+    """
+    Boolean mask (one entry per pixel along an axis) of all grid lines crossing that axis.
+
+    Lines sit at i * cell_size for i in 0..count-1 plus a last line at 'length'.
+    Every highlight_every-th line is one pixel thicker. Band placement matches
+    ImageDraw.line with float coordinates: the position is truncated to an int and
+    a line of width w covers [pos - (w - 1) // 2, pos - (w - 1) // 2 + w).
+    """
+    index = np.arange(count + 1)
+    positions = (index[:-1] * cell_size).astype(np.int64)
+    positions = np.append(positions, length)
+
+    widths = np.full(count + 1, max(1, thickness), dtype=np.int64)
+    if highlight_every:
+        widths += index % highlight_every == 0
+
+    starts = positions - (widths - 1) // 2
+    stops = np.clip(starts + widths, 0, length)
+    starts = np.clip(starts, 0, length)
+
+    # Mark band edges (+1 at start, -1 at stop) and integrate: pixels inside any band stay > 0
+    edges = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, stops, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+class GridMaskCache:
+    """
+    Thread-safe LRU cache of rendered grid line masks with a byte budget.
+
+    A batch of same-sized images (or repeated preview renders) needs the very same
+    grid over and over; with the mask cached, applying the grid is a single paste.
+    Masks are keyed by geometry only, the line color is applied at paste time, so
+    restyling the color reuses the mask as well.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._masks = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, width, height, rows, cols, thickness, highlight_every):
+        key = (width, height, rows, cols, thickness, highlight_every)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+
+        mask = build_grid_mask(*key)
+        size = width * height  # mode "1" images use one byte per pixel
+
+        with self._lock:
+            if size <= self.max_bytes and key not in self._masks:
+                self._masks[key] = mask
+                self._bytes += size
+                # Evict least recently used masks until we are back under budget
+                while self._bytes > self.max_bytes:
+                    (old_w, old_h, *_), _old = self._masks.popitem(last=False)
+                    self._bytes -= old_w * old_h
+        return mask
+
+    def clear(self):
+        with self._lock:
+            self._masks.clear()
+            self._bytes = 0
+
+
+def build_grid_mask(width, height, rows, cols, thickness=1, highlight_every=0):
+    """Renders the grid lines of an image of the given size into a mode "1" mask."""
+    cell_size, cols_needed, rows_needed = grid_geometry(width, height, rows, cols)
+    row_mask = line_mask(height, rows_needed, cell_size, thickness, highlight_every)
+    col_mask = line_mask(width, cols_needed, cell_size, thickness, highlight_every)
+    return Image.fromarray(np.logical_or.outer(row_mask, col_mask))
+
+
+# Process-wide cache shared by batch workers (threads) and the preview
+GRID_MASKS = GridMaskCache()
+
+
+def draw_grid(img, rows, cols, color, thickness=1, highlight_every=0, offset=(0, 0), size=None):
+    """
+    Draws a grid on the given PIL image object (in place) and returns it.
+    Tries to keep cells square and covers the entire image, or only the
+    size=(width, height) area at offset when the image has extra margins.
+
+    The line mask comes from GRID_MASKS (built with NumPy on first use) and is
+    applied with a single solid-color paste. The result is pixel-identical to
+    drawing each line with ImageDraw. On a "P" image the color must already be in
+    its palette (see gridmaker.palette.compact_palette).
+    """
+    width, height = size or img.size
+    left, top = offset
+    mask = GRID_MASKS.get(width, height, rows, cols, thickness, highlight_every)
+    ink = color_index(img, color) if img.mode == "P" else ImageColor.getcolor(color, img.mode)
+    img.paste(ink, (left, top, left + width, top + height), mask)
+    return img
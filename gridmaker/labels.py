@@ -0,0 +1,199 @@
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from .palette import color_index
+
+# Font faces used for the grid numbers (regular / bold); looked up by FreeType by file name
+NUMBER_FONT = "arial.ttf"
+NUMBER_BOLD_FONT = "arialbd.ttf"
+
+# Size used for the margins when the faces above cannot be loaded
+FALLBACK_FONT_SIZE = 14
+
+# Coverage levels of anti-aliased numbers on palette ("P") output: glyph edges are
+# drawn with TEXT_SHADES - 1 blends of the text and background colors
+TEXT_SHADES = 4
+
+# FreeType faces are not safe to rasterize from several threads at once
+_render_lock = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def load_font(face, size):
+    """
+    Process-wide font cache keyed by (face, size).
+    Returns None when the face cannot be loaded; the failure is cached too, so
+    a missing font costs one lookup per size instead of one per image.
+    """
+    try:
+        return ImageFont.truetype(face, size)
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def default_font():
+    """Pillow's built-in font (what ImageDraw falls back to when no font is given)."""
+    return ImageFont.load_default()
+
+
+def number_fonts(font_size):
+    """
+    (regular, bold, font_size) for the grid numbers.
+    Falls back to the default font (and FALLBACK_FONT_SIZE for layout) unless both faces load.
+    """
+    font = load_font(NUMBER_FONT, font_size)
+    bold_font = load_font(NUMBER_BOLD_FONT, font_size)
+    if font is None or bold_font is None:
+        fallback = default_font()
+        return fallback, fallback, FALLBACK_FONT_SIZE
+    return font, bold_font, font_size
+
+
+@lru_cache(maxsize=1024)
+def glyph_sprite(text, font):
+    """
+    Pre-rasterised label: an "L" coverage mask of the text plus the offset of its
+    bounding box from the text origin. Stamping the text color through this mask at
+    origin + offset is pixel-identical to ImageDraw.text, for any color.
+
+    :return: (mask, (left, top)); mask.size is the measured text size.
+    """
+    with _render_lock:
+        left, top, right, bottom = font.getbbox(text)
+        mask = Image.new("L", (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+    return mask, (left, top)
+
+
+@lru_cache(maxsize=1024)
+def shade_masks(text, font, shades=TEXT_SHADES):
+    """
+    The glyph sprite's coverage split into 'shades' levels: one "1" mask per level
+    (lightest first), for drawing anti-aliased text with a few palette entries.
+    """
+    mask, _offset = glyph_sprite(text, font)
+    levels = np.rint(np.asarray(mask, dtype=np.float32) * shades / 255).astype(np.uint8)
+    return tuple(Image.fromarray(levels == level) for level in range(1, shades + 1))
+
+
+def text_shades(text_color, bg_color, shades=TEXT_SHADES):
+    """RGB colors of the coverage levels of shade_masks, blended from bg_color to text_color."""
+    text = np.array(ImageColor.getrgb(text_color)[:3], dtype=np.float32)
+    bg = np.array(ImageColor.getrgb(bg_color)[:3], dtype=np.float32)
+    return tuple(tuple(int(v) for v in np.rint(bg + (text - bg) * level / shades)) for level in range(1, shades + 1))
+
+
+def stamp(img, text, font, xy, color, shades=None):
+    """
+    Draws text at xy (like ImageDraw.text) using the cached glyph sprite.
+    With shades (palette indices of the text_shades colors) the coverage is drawn in
+    those levels instead of blended, so a "P" image keeps its palette.
+    """
+    mask, (left, top) = glyph_sprite(text, font)
+    x = xy[0] + left
+    y = xy[1] + top
+    box = (x, y, x + mask.width, y + mask.height)
+    if shades is None:
+        img.paste(color, box, mask)
+        return
+    for ink, level_mask in zip(shades, shade_masks(text, font, len(shades))):
+        img.paste(ink, box, level_mask)
+
+
+NumberLayout = namedtuple("NumberLayout", ["font", "bold_font", "font_size", "margin"])
+
+
+def number_layout(width, height):
+    """
+    Fonts and margin for numbering an image of the given size.
+    Depends only on the size, so the final canvas can be allocated before rendering.
+    """
+    font, bold_font, font_size = number_fonts(max(14, min(width, height) // 40))
+    margin = int(max(min(width, height) * 0.07, font_size * 2.5))
+    return NumberLayout(font, bold_font, font_size, margin)
+
+
+def number_canvas(img, layout, bg_color):
+    """
+    Allocates the final output (image plus top/left number margins) once and
+    places the image in it; the grid and the numbers are then drawn in place.
+    A "P" image gets a "P" canvas with the same palette (bg_color must be in it).
+
+    The canvas is left uninitialized and every pixel is written once: the image is
+    copied into place and only the two margin strips are filled (Image.new with a
+    color, as ImageOps.expand does, would first fill the whole canvas).
+    """
+    width, height = img.size
+    margin = layout.margin
+    size = (width + margin, height + margin)
+    if img.mode == "P":
+        canvas = Image.new("P", size, None)
+        canvas.putpalette(img.getpalette())
+        fill = color_index(img, bg_color)
+    else:
+        canvas = Image.new("RGB", size, None)
+        fill = bg_color
+    canvas.paste(fill, (0, 0, size[0], margin))
+    canvas.paste(fill, (0, margin, margin, size[1]))
+    canvas.paste(img, (margin, margin))
+    return canvas
+
+
+def draw_grid_numbers(canvas, layout, size, rows_setting, text_color, bg_color="#FFFFFF"):
+    """
+    Stamps the row/column numbers into the margins of a canvas from number_canvas.
+
+    :param size: (width, height) of the image area inside the margins.
+    :param bg_color: Margin color; only used on a "P" canvas, whose palette must hold
+                     the text_shades of text_color over it.
+    """
+    shades = None
+    if canvas.mode == "P":
+        shades = [color_index(canvas, color) for color in text_shades(text_color, bg_color)]
+
+    width, height = size
+    margin_left = margin_top = layout.margin
+    font, bold_font, font_size = layout.font, layout.bold_font, layout.font_size
+
+    if height >= width:
+        rows = rows_setting
+        cols = round(rows * (width / height))
+    else:
+        cols = rows_setting
+        rows = round(cols * (height / width))
+
+    row_step = height / rows
+    col_step = width / cols
+
+    # Row numbers every 10 rows
+    for i in range(0, rows + 1, 10):
+        num = i // 10  # numbering logic
+
+        y = round(i * row_step) + margin_top
+        text = str(num)
+
+        is_bold = (num == 0) or (num % 5 == 0)
+        f = bold_font if is_bold else font
+
+        w, h = glyph_sprite(text, f)[0].size
+        stamp(canvas, text, f, (margin_left - w - max(5, font_size // 2), y - h), text_color, shades)
+
+    # Column numbers every 10 columns
+    for i in range(0, cols + 1, 10):
+        num = i // 10
+
+        x = round(i * col_step) + margin_left
+        text = str(num)
+
+        is_bold = (num == 0) or (num % 5 == 0)
+        f = bold_font if is_bold else font
+
+        w, h = glyph_sprite(text, f)[0].size
+        stamp(canvas, text, f, (x - w // 2, margin_top - h - max(5, font_size // 2) - 5), text_color, shades)
+
+    return canvas
@@ -0,0 +1,515 @@
+"""
+Fixed palettes and the RGB → palette index lookup tables (LUTs) used to map them.
+
+A fixed palette is either a named one ("Game Boy") or a list of hex colors given as
+the pixel_art_palette value, e.g. "#000000, #FFFFFF, #FF0000". Instead of searching
+the nearest color for every pixel, the palette is solved once for every cell of a
+LUT_BITS-per-channel RGB grid; mapping an image is then a single NumPy gather.
+LUTs are cached in memory and on disk, so a batch (and the next run) reuses them.
+"Nearest" is measured in RGB or, for thread/bead matching, perceptually in CIELAB
+(see COLOR_METRICS); the metric only changes how the table is built, so mapping
+costs the same either way and does not grow with the palette size.
+
+Adaptive palettes ("16", "32", "64") are solved per image by one of the QUANTIZERS:
+Pillow's median cut, fast octree or libimagequant (when Pillow was built with it),
+or a NumPy mini-batch k-means on a subsample of the pixels.
+"""
+
+import hashlib
+import io
+import itertools
+import os
+import re
+import sys
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor, features
+
+# Original Game Boy (DMG) LCD shades, darkest to lightest
+GAME_BOY = ("#0F380F", "#306230", "#8BAC0F", "#9BBC0F")
+
+# 216-color web palette (6 levels per channel): the target of ordered dithering without a palette
+WEB_PALETTE = tuple((r, g, b) for r in range(0, 256, 51) for g in range(0, 256, 51) for b in range(0, 256, 51))
+
+# Named fixed palettes (matched case-insensitively against pixel_art_palette)
+FIXED_PALETTES = {
+    "game boy": GAME_BOY,
+}
+
+# Bits per channel of the lookup table grid (5 → 32³ cells, 32 KB per palette)
+LUT_BITS = 5
+
+# Grid cells solved per NumPy pass when building a table (bounds the distance matrix;
+# scaled down for palettes over 256 colors so the matrix stays the same size)
+LUT_CHUNK = 4096
+
+# Largest fixed palette (thread and bead palettes run to a few hundred colors). Palettes
+# over 256 colors get a uint16 table and map to RGB instead of a "P" image; their colors
+# lie so close together that the nearest color of a table cell's center is often not the
+# nearest one of every RGB value in the cell, so they are matched exactly against the
+# cell's candidate colors (see build_candidates).
+MAX_PALETTE_COLORS = 4096
+
+# Safety factor on a table cell's CIELAB radius (measured at its corners, and the
+# RGB → Lab mapping is not linear inside the cell)
+LAB_RADIUS_MARGIN = 1.25
+
+# Color distance used to map onto a fixed palette (setting value → metric)
+COLOR_METRICS = {"RGB": "rgb", "Lab": "lab"}
+
+# sRGB (D65) → CIE XYZ, and the D65 reference white
+_RGB_TO_XYZ = np.array(
+    [[0.4124564, 0.3575761, 0.1804375], [0.2126729, 0.7151522, 0.0721750], [0.0193339, 0.1191920, 0.9503041]],
+    dtype=np.float32,
+)
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+# Adaptive palette solvers, as offered in the UI (see quantizer_name)
+QUANTIZERS = ("Median Cut", "Fast Octree", "libimagequant", "K-Means")
+QUANTIZER_METHODS = {
+    "Median Cut": Image.Quantize.MEDIANCUT,
+    "Fast Octree": Image.Quantize.FASTOCTREE,
+    "libimagequant": Image.Quantize.LIBIMAGEQUANT,
+}
+DEFAULT_QUANTIZER = "Median Cut"
+
+# Mini-batch k-means: pixels sampled from the image, batch size and batch count
+KMEANS_SAMPLE = 16384
+KMEANS_BATCH = 1024
+KMEANS_ITERATIONS = 64
+
+
+def cache_dir():
+    """Folder for on-disk caches (GRIDMAKER_CACHE_DIR overrides the per-user default)."""
+    override = os.getenv("GRIDMAKER_CACHE_DIR")
+    if override:
+        return override
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("LOCALAPPDATA", tempfile.gettempdir()), "Grid Maker", "cache")
+    return os.path.join(os.getenv("HOME", tempfile.gettempdir()), ".Grid Maker", "cache")
+
+
+@lru_cache(maxsize=64)
+def parse_palette(value):
+    """
+    Colors of a fixed palette option as a tuple of (r, g, b), or None when the value
+    does not name a fixed palette ("None", "16", ... are handled by the quantizer).
+
+    :raises ValueError: for a hex list with invalid colors or more than MAX_PALETTE_COLORS entries.
+    """
+    text = str(value).strip()
+    if text.lower() in FIXED_PALETTES:
+        names = FIXED_PALETTES[text.lower()]
+    elif "#" in text:
+        names = [name for name in re.split(r"[\s,;]+", text) if name]
+    else:
+        return None
+
+    colors = tuple(ImageColor.getrgb(name)[:3] for name in names)
+    if not 1 <= len(colors) <= MAX_PALETTE_COLORS:
+        raise ValueError(f"A palette needs 1 to {MAX_PALETTE_COLORS} colors, got {len(colors)}")
+    return colors
+
+
+def color_metric(value):
+    """The COLOR_METRICS entry for a setting value (matched case-insensitively, default "rgb")."""
+    text = str(value).strip().lower()
+    for name, metric in COLOR_METRICS.items():
+        if name.lower() == text:
+            return metric
+    return "rgb"
+
+
+def rgb_to_lab(rgb):
+    """
+    CIELAB (D65) coordinates of sRGB colors: an (..., 3) array of 0-255 values in,
+    float32 (L, a, b) out. Fully vectorized, so a whole image or table converts at once.
+    """
+    c = np.asarray(rgb, dtype=np.float32) / 255
+    # Undo the sRGB transfer curve
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE_D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty(f.shape, dtype=np.float32)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def _nearest(pixels, centers):
+    """Index of the nearest center for every pixel (float32 arrays, squared Euclidean distance)."""
+    # |p - c|² = |p|² - 2 p·c + |c|²; |p|² is the same for every center and can be dropped
+    distances = (centers * centers).sum(axis=1) - 2 * pixels @ centers.T
+    return distances.argmin(axis=1)
+
+
+def lut_dtype(colors):
+    """Index type of a palette's lookup table: uint8 up to 256 colors, uint16 beyond."""
+    return np.uint8 if len(colors) <= 256 else np.uint16
+
+
+def _lut_grid(values):
+    """All (r, g, b) combinations of the per-channel values, as an (n³, 3) float32 array."""
+    r, g, b = np.meshgrid(values, values, values, indexing="ij")
+    return np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+
+def _cell_index(rgb, bits=LUT_BITS):
+    """Flat table index (r, g, b) → r·levels² + g·levels + b of every pixel of an (..., 3) uint8 array."""
+    shift = 8 - bits
+    index = (rgb[..., 0] >> shift).astype(np.int32) << (2 * bits)
+    index |= (rgb[..., 1] >> shift).astype(np.int32) << bits
+    index |= rgb[..., 2] >> shift
+    return index
+
+
+def build_lut(colors, bits=LUT_BITS, metric="rgb"):
+    """
+    Nearest palette index for the center of every cell of a (2**bits)³ RGB grid, as a
+    lut_dtype(colors) array indexed [r >> shift, g >> shift, b >> shift]. Distances are
+    squared RGB or, for metric "lab", squared CIELAB (ΔE76) distances.
+    """
+    levels = 1 << bits
+    step = 256 / levels
+    grid = _lut_grid(np.arange(levels, dtype=np.float32) * step + (step - 1) / 2)
+    palette = np.asarray(colors, dtype=np.float32)
+    if metric == "lab":
+        grid, palette = rgb_to_lab(grid), rgb_to_lab(palette)
+
+    lut = np.empty(len(grid), dtype=lut_dtype(colors))
+    chunk = max(1, LUT_CHUNK * 256 // max(256, len(palette)))
+    for start in range(0, len(grid), chunk):
+        lut[start : start + chunk] = _nearest(grid[start : start + chunk], palette)
+    return lut.reshape(levels, levels, levels)
+
+
+def build_candidates(colors, bits=LUT_BITS, metric="rgb"):
+    """
+    Candidate palette indices for every cell of a (2**bits)³ RGB grid: each color that
+    can be the nearest one of some RGB value in the cell, nearest to the cell center
+    first. By the triangle inequality that is every color no farther from the center
+    than the nearest color plus twice the cell radius. Returned as a (levels³, width)
+    lut_dtype(colors) array; rows are padded with farther colors or their nearest color.
+    """
+    levels = 1 << bits
+    step = 256 // levels
+    lows = _lut_grid(np.arange(levels, dtype=np.float32) * step)
+    centers = lows + (step - 1) / 2
+    palette = np.asarray(colors, dtype=np.float32)
+    if metric == "lab":
+        palette = rgb_to_lab(palette)
+        center_lab = rgb_to_lab(centers)
+        radius = np.zeros(len(centers), dtype=np.float32)
+        for corner in itertools.product((0, step - 1), repeat=3):
+            offset = rgb_to_lab(lows + np.asarray(corner, dtype=np.float32)) - center_lab
+            radius = np.maximum(radius, np.sqrt((offset * offset).sum(axis=1)))
+        centers, radius = center_lab, radius * LAB_RADIUS_MARGIN
+    else:
+        radius = np.full(len(centers), np.sqrt(3) * (step - 1) / 2, dtype=np.float32)
+
+    norms = (palette * palette).sum(axis=1)
+    chunk = max(1, LUT_CHUNK * 256 // max(256, len(palette)))
+    rows = []
+    for start in range(0, len(centers), chunk):
+        cells = centers[start : start + chunk]
+        squared = norms - 2 * cells @ palette.T + (cells * cells).sum(axis=1, keepdims=True)
+        distances = np.sqrt(np.maximum(squared, 0))
+        limit = distances.min(axis=1) + 2 * radius[start : start + chunk]
+        width = int((distances <= limit[:, None]).sum(axis=1).max())
+        # A row's first 'width' colors by distance hold all its candidates (and maybe a few
+        # more, which only cost a comparison)
+        rows.append(np.argsort(distances, axis=1)[:, :width])
+
+    width = max(order.shape[1] for order in rows)
+    candidates = np.empty((len(centers), width), dtype=lut_dtype(colors))
+    position = 0
+    for order in rows:
+        candidates[position : position + len(order)] = order[:, :1]
+        candidates[position : position + len(order), : order.shape[1]] = order
+        position += len(order)
+    return candidates
+
+
+def read_cache_file(name):
+    """Contents of a file in cache_dir(), or None when it is missing or unreadable."""
+    try:
+        with open(os.path.join(cache_dir(), name), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cache_file(name, data):
+    """
+    Stores bytes in cache_dir() (best effort: an unwritable cache only costs a rebuild).
+    Written to a temporary file first, so concurrent workers never read a partial file.
+    """
+    folder = cache_dir()
+    try:
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(folder, name))
+    except OSError:
+        pass
+
+
+def _cached_table(kind, colors, bits, metric, build, valid):
+    """A palette table from the disk cache, or freshly built (and then saved)."""
+    name = f"{kind}-" + hashlib.sha1(repr((colors, bits, metric)).encode()).hexdigest()[:20] + ".npy"
+    data = read_cache_file(name)
+    if data:
+        try:
+            table = np.load(io.BytesIO(data))
+            if valid(table) and table.dtype == lut_dtype(colors):
+                return table
+        except ValueError:
+            pass
+
+    table = build(colors, bits, metric)
+    buffer = io.BytesIO()
+    np.save(buffer, table)
+    write_cache_file(name, buffer.getvalue())
+    return table
+
+
+@lru_cache(maxsize=32)
+def palette_lut(colors, bits=LUT_BITS, metric="rgb"):
+    """Lookup table for a palette, from memory, the disk cache or freshly built (and then saved)."""
+    levels = 1 << bits
+    return _cached_table("lut", colors, bits, metric, build_lut, lambda lut: lut.shape == (levels, levels, levels))
+
+
+@lru_cache(maxsize=8)
+def palette_candidates(colors, bits=LUT_BITS, metric="rgb"):
+    """Candidate table for a palette (see build_candidates), cached like palette_lut."""
+    cells = 1 << (3 * bits)
+    return _cached_table(
+        "candidates", colors, bits, metric, build_candidates, lambda table: table.ndim == 2 and len(table) == cells
+    )
+
+
+def flat_palette(colors, length=256):
+    """Palette in putpalette() layout, padded to 'length' entries by repeating the last color."""
+    padded = list(colors) + [colors[-1]] * (length - len(colors))
+    return [channel for color in padded for channel in color]
+
+
+def palette_image(colors):
+    """1×1 "P" image carrying the palette, for Image.quantize(palette=...)."""
+    img = Image.new("P", (1, 1))
+    # Padded so dithering can never pick an unused (black) slot
+    img.putpalette(flat_palette(colors))
+    return img
+
+
+def map_to_palette(img, colors, metric="rgb"):
+    """
+    Maps an RGB image to a "P" image of the fixed palette with one LUT gather. Palettes
+    over 256 colors, which "P" cannot hold, give an RGB image of their colors, with every
+    pixel matched exactly (see nearest_colors).
+    """
+    rgb = np.asarray(img)
+    if len(colors) > 256:
+        return Image.fromarray(np.asarray(colors, dtype=np.uint8)[nearest_colors(rgb, colors, metric)])
+    lut = palette_lut(colors, LUT_BITS, metric)
+    result = Image.fromarray(np.take(lut.ravel(), _cell_index(rgb)))
+    result.putpalette(flat_palette(colors, len(colors)))
+    return result
+
+
+def nearest_colors(rgb, colors, metric="rgb"):
+    """
+    Exact nearest palette index of every pixel of an (..., 3) uint8 array. The pixel's
+    table cell narrows the palette down to a few candidates (see build_candidates), so
+    the search costs pixels × candidates rather than pixels × palette size.
+    """
+    candidates = palette_candidates(colors, LUT_BITS, metric)
+    palette = np.asarray(colors, dtype=np.float32)
+    if metric == "lab":
+        palette = rgb_to_lab(palette)
+    # Each distinct color is matched once (pixel art cells repeat colors a lot)
+    packed = (rgb[..., 0].astype(np.int32) << 16) | (rgb[..., 1].astype(np.int32) << 8) | rgb[..., 2]
+    packed, inverse = np.unique(packed.ravel(), return_inverse=True)
+    pixels = np.stack([packed >> 16, (packed >> 8) & 255, packed & 255], axis=1).astype(np.uint8)
+    result = np.empty(len(pixels), dtype=candidates.dtype)
+    chunk = max(1, LUT_CHUNK * 256 // candidates.shape[1])
+    for start in range(0, len(pixels), chunk):
+        block = pixels[start : start + chunk]
+        points = rgb_to_lab(block) if metric == "lab" else block.astype(np.float32)
+        options = candidates[_cell_index(block)]
+        offsets = palette[options] - points[:, None, :]
+        best = (offsets * offsets).sum(axis=2).argmin(axis=1)
+        result[start : start + chunk] = options[np.arange(len(options)), best]
+    return result[inverse].reshape(rgb.shape[:-1])
+
+
+def compact_palette(img, extra_colors=()):
+    """
+    Re-indexes a "P" image to a palette of just its used colors followed by extra_colors
+    (colors the later stages will draw with, skipped when already present), so the saved
+    PNG can use as few bits per pixel as possible. None when they do not fit in 256 entries.
+    """
+    flat = img.getpalette()
+    colors = []
+    position = {}
+    remap = np.zeros(256, dtype=np.uint8)
+    for index in sorted(index for _count, index in img.getcolors(256)):
+        color = tuple(flat[3 * index : 3 * index + 3])
+        if color not in position:
+            position[color] = len(colors)
+            colors.append(color)
+        remap[index] = position[color]
+    for color in extra_colors:
+        if color not in position:
+            position[color] = len(colors)
+            colors.append(color)
+    if len(colors) > 256:
+        return None
+
+    result = Image.fromarray(np.take(remap, np.asarray(img)))
+    result.putpalette(flat_palette(colors, len(colors)))
+    return result
+
+
+def color_index(img, color):
+    """Palette index of a color (ImageColor string or RGB tuple) in a "P" image; it must be in the palette."""
+    rgb = tuple(color[:3]) if isinstance(color, tuple) else ImageColor.getrgb(color)[:3]
+    flat = img.getpalette()
+    for index in range(len(flat) // 3):
+        if tuple(flat[3 * index : 3 * index + 3]) == rgb:
+            return index
+    raise ValueError(f"{color} is not in the image palette")
+
+
+def palette_hex(colors):
+    """Formats palette colors as a hex list (a valid fixed pixel_art_palette value)."""
+    return ", ".join(f"#{r:02X}{g:02X}{b:02X}" for r, g, b in colors)
+
+
+class PixelReservoir:
+    """
+    Uniform random sample of at most 'size' pixels out of every pixel added so far
+    (reservoir sampling, vectorized per added image), so a palette can be solved
+    from a whole batch with a fixed amount of memory.
+    """
+
+    def __init__(self, size=65536, seed=0):
+        self.size = size
+        self.pixels = np.empty((size, 3), dtype=np.uint8)
+        self.count = 0  # filled slots
+        self.seen = 0  # pixels offered so far
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, img):
+        """Offers every pixel of an RGB image to the sample."""
+        pixels = np.asarray(img).reshape(-1, 3)
+
+        # Fill the free slots first
+        free = min(self.size - self.count, len(pixels))
+        self.pixels[self.count : self.count + free] = pixels[:free]
+        self.count += free
+        self.seen += free
+        rest = pixels[free:]
+        if not len(rest):
+            return
+
+        # Pixel number t (1-based) replaces a random slot with probability size / t
+        seen = self.seen + np.arange(1, len(rest) + 1)
+        slots = (self._rng.random(len(rest)) * seen).astype(np.int64)
+        keep = slots < self.size
+        # Fancy assignment keeps the last write per slot, like the sequential algorithm
+        self.pixels[slots[keep]] = rest[keep]
+        self.seen += len(rest)
+
+    def image(self):
+        """The sampled pixels as a one-row RGB image (empty sample → None)."""
+        if not self.count:
+            return None
+        return Image.fromarray(self.pixels[None, : self.count])
+
+
+@lru_cache(maxsize=1)
+def available_quantizers():
+    """QUANTIZERS usable with this Pillow build (libimagequant is an optional feature)."""
+    return tuple(name for name in QUANTIZERS if name != "libimagequant" or features.check_feature("libimagequant"))
+
+
+def quantizer_name(value):
+    """
+    The QUANTIZERS entry for a setting value (matched case-insensitively). Unknown
+    values and backends missing from this Pillow build fall back to DEFAULT_QUANTIZER,
+    so a config written on another machine still renders.
+    """
+    text = str(value).strip().lower()
+    for name in available_quantizers():
+        if name.lower() == text:
+            return name
+    return DEFAULT_QUANTIZER
+
+
+def kmeans_palette(img, colors, seed=0):
+    """
+    Palette of at most 'colors' entries for an RGB image by mini-batch k-means.
+
+    KMEANS_SAMPLE random pixels are drawn once; the centers are seeded with k-means++
+    on that sample and then refined on KMEANS_ITERATIONS random batches, each center
+    moving towards the mean of its batch pixels with a step that shrinks as it gathers
+    more pixels (Sculley's mini-batch update). Cost is independent of the image size.
+    """
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(img).reshape(-1, 3)
+    if len(pixels) > KMEANS_SAMPLE:
+        pixels = pixels[rng.integers(0, len(pixels), KMEANS_SAMPLE)]
+    unique = np.unique(pixels, axis=0)
+    if len(unique) <= colors:
+        return tuple(map(tuple, unique.tolist()))
+    pixels = pixels.astype(np.float32)
+
+    # k-means++ seeding: each new center is drawn with probability ~ squared distance
+    centers = np.empty((colors, 3), dtype=np.float32)
+    centers[0] = pixels[rng.integers(len(pixels))]
+    closest = ((pixels - centers[0]) ** 2).sum(axis=1)
+    for k in range(1, colors):
+        total = closest.sum()
+        index = rng.choice(len(pixels), p=closest / total) if total > 0 else rng.integers(len(pixels))
+        centers[k] = pixels[index]
+        np.minimum(closest, ((pixels - centers[k]) ** 2).sum(axis=1), out=closest)
+
+    counts = np.zeros(colors, dtype=np.float32)
+    for _ in range(KMEANS_ITERATIONS):
+        batch = pixels[rng.integers(0, len(pixels), KMEANS_BATCH)]
+        labels = _nearest(batch, centers)
+        hits = np.bincount(labels, minlength=colors).astype(np.float32)
+        sums = np.stack([np.bincount(labels, batch[:, c], minlength=colors) for c in range(3)], axis=1)
+        counts += hits
+        moved = hits > 0
+        # Per-pixel learning rate 1/count, applied to the whole batch at once
+        centers[moved] += (sums[moved] - hits[moved, None] * centers[moved]) / counts[moved, None]
+
+    palette = np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+    return tuple(dict.fromkeys(map(tuple, palette.tolist())))
+
+
+def quantize(img, colors, quantizer=DEFAULT_QUANTIZER):
+    """Reduces an RGB image to an adaptive palette of at most 'colors' entries ("P" image, no dithering)."""
+    name = quantizer_name(quantizer)
+    if name == "K-Means":
+        return img.quantize(palette=palette_image(kmeans_palette(img, colors)), dither=Image.Dither.NONE)
+    return img.quantize(colors=colors, method=QUANTIZER_METHODS[name], dither=Image.Dither.NONE)
+
+
+def used_colors(img):
+    """Palette colors actually used by a "P" image, as (r, g, b) tuples in index order."""
+    flat = img.getpalette()
+    used = sorted(index for _count, index in img.getcolors(256))
+    return tuple(tuple(flat[3 * i : 3 * i + 3]) for i in used)
+
+
+def solve_palette(sample, colors, quantizer=DEFAULT_QUANTIZER):
+    """Solves a palette of at most 'colors' entries for a sample image; returns (r, g, b) tuples."""
+    return used_colors(quantize(sample, colors, quantizer))
@@ -0,0 +1,164 @@
+import os
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+from .pixelart import downscale
+from .plan import REDUCIBLE_MODES, PixelArt, compile_plan
+
+# Supported input image formats (lower-case extensions)
+SUPPORTED_FORMATS = (".png", ".jpg", ".jpeg", ".avif", ".webp")
+
+
+def list_images(folder):
+    """Returns the names of all supported image files in the given folder."""
+    return [
+        f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(SUPPORTED_FORMATS)
+    ]
+
+
+def unique_path(file_path, reserved=None):
+    """
+    Returns a unique file path by appending _01, _02, ... if needed.
+    Paths in 'reserved' are treated as already taken (used when several
+    output names are handed out before any file is written).
+    Example:
+        test.png -> test.png
+        (exists) -> test_01.png
+        (exists) -> test_02.png
+    """
+    reserved = reserved if reserved is not None else ()
+
+    def taken(path):
+        return os.path.exists(path) or path in reserved
+
+    # If the file does NOT already exist → return original
+    if not taken(file_path):
+        return file_path
+
+    dir_name = os.path.dirname(file_path)
+    name, ext = os.path.splitext(os.path.basename(file_path))
+
+    # Otherwise add counters
+    counter = 1
+    while True:
+        new_path = os.path.join(dir_name, f"{name}_{counter:02d}{ext}")
+        if not taken(new_path):
+            return new_path
+        counter += 1
+
+
+def output_filename(filename):
+    """Builds the batch output file name ("grid_<name><ext>") for an input file name."""
+    base_name, ext = os.path.splitext(filename)
+    # Replace spaces and parentheses with underscores for file system compatibility
+    safe_base_name = base_name.replace(" ", "_").replace("(", "").replace(")", "")
+    return f"grid_{safe_base_name}{ext}"
+
+
+def render_image(img, settings, in_place=False, indexed=False):
+    """
+    Runs the full pipeline (trim → zoom → pixel art → grid → numbers) on an image.
+    The settings are compiled into a RenderPlan for the image's size and mode first,
+    so stages that would not change anything are not run at all.
+
+    :param img: Source PIL image (any mode; converted to RGB by the plan when needed),
+                or the path of an image file, which is then decoded with decode_image.
+    :param settings: RenderSettings snapshot.
+    :param in_place: The caller no longer needs img, so the plan may draw into it directly.
+    :param indexed: Palette-reduced pixel art may come back as a "P" image (for PNG output).
+    :return: (rendered image, RGB unless indexed; grid rows actually used)
+    """
+    if isinstance(img, (str, os.PathLike)):
+        img, plan = decode_image(img, settings, indexed)
+        in_place = True
+    else:
+        plan = compile_plan(settings, img.size, img.mode, indexed)
+
+    # Only 'img' refers to the current image, so each stage's input is freed as soon
+    # as the next one has been produced. Drawing steps get a private copy unless the
+    # caller gave the image away or an earlier step already produced a new one.
+    owned = in_place
+    for step in plan.steps:
+        if step.in_place and not owned:
+            img = img.copy()
+        img = step.apply(img)
+        owned = True
+    return img, plan.rows
+
+
+def output_format(output_path):
+    """Format an output file is written in: JPEG for .jpg/.jpeg, PNG for everything else."""
+    ext = os.path.splitext(output_path)[1]
+    return "JPEG" if ext.lower() in (".jpg", ".jpeg") else "PNG"
+
+
+def save_image(img, output_path):
+    """
+    Saves the image, choosing the format from the output file extension.
+    "P" images are written as indexed PNGs; Pillow picks 1, 2, 4 or 8 bits per pixel
+    from the palette length, which render plans keep to the colors actually used.
+    """
+    save_format = output_format(output_path)
+
+    # Use quality setting for JPEG to ensure good output size/quality balance
+    if save_format == "JPEG":
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(output_path, format=save_format, quality=95)
+    else:
+        img.save(output_path, format=save_format)
+
+
+def decode_image(input_path, settings, indexed=False):
+    """
+    Decodes an image file at the smallest resolution its render plan can use.
+
+    The plan is compiled from the file header first. When it allows a reduced source
+    (max_reduce > 1, only for RGB and grayscale sources), JPEGs (including MPOs) are
+    decoded directly at 1/2, 1/4 or 1/8 size with DCT scaling (draft) and other files
+    are box-reduced right after decoding, so every later stage works on the smaller image.
+
+    :return: (image, RenderPlan for that image)
+    """
+    with Image.open(input_path) as src:
+        size, mode = src.size, src.mode
+        reduce = compile_plan(settings, size, mode, indexed).max_reduce
+        if reduce > 1 and isinstance(src, JpegImageFile):
+            # draft never goes below the requested size, so the reduction stays <= reduce
+            src.draft(mode, (-(-size[0] // reduce), -(-size[1] // reduce)))
+        src.load()
+        img = src
+
+    if reduce > 1 and img.size == size and img.mode in REDUCIBLE_MODES:
+        img = img.reduce(reduce)
+
+    plan = compile_plan(settings, size, img.mode, indexed)
+    return img, plan.for_decoded_size(img.size)
+
+
+def pixel_cells(input_path, settings):
+    """
+    The pixel art cells of an image file (one RGB pixel per cell, before any palette
+    reduction), or None when pixel art is disabled. Used to sample batch palettes.
+    """
+    img, plan = decode_image(input_path, settings)
+    for step in plan.steps:
+        if isinstance(step, PixelArt):
+            return downscale(img, step.small, step.box, step.resample)
+        img = step.apply(img)
+    return None
+
+
+def process_image(input_path, output_path, settings):
+    """
+    Applies padding removal, resizing, pixel art and grid overlay to a single image and saves it.
+
+    :param input_path: Full path to the input image file.
+    :param output_path: Full path to save the processed image.
+    :param settings: RenderSettings snapshot.
+    """
+    # render_image decodes the file itself (at a reduced size when the plan allows), so
+    # no local keeps the source alive and each stage's input is freed as soon as possible.
+    # PNG output keeps palette pixel art indexed (much smaller files, faster to encode).
+    img, _ = render_image(input_path, settings, indexed=output_format(output_path) == "PNG")
+    save_image(img, output_path)
@@ -0,0 +1,306 @@
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from .dither import FLOYD_STEINBERG, error_diffuse, error_kernel, ordered_dither, threshold_matrix
+from .scalers import scale_pixels
+from .palette import (
+    DEFAULT_QUANTIZER,
+    LUT_BITS,
+    WEB_PALETTE,
+    build_lut,
+    map_to_palette,
+    palette_image,
+    palette_lut,
+    parse_palette,
+    quantize,
+    used_colors,
+)
+
+# Pixel art dimensions for a given input size and scale:
+#   small   - (small_w, small_h) cell count
+#   box     - centered crop box whose size is an exact multiple of scale
+#   target  - (width, height) of the upscaled result (= box size)
+PixelGeometry = namedtuple("PixelGeometry", ["small", "box", "target"])
+
+# How each cell's color is taken from its scale×scale block:
+#   Nearest - a single source pixel (crisp, the classic look)
+#   Average - mean color of the block (stable on noisy photos, no aliasing)
+#   Smooth  - LANCZOS resample of the block (anti-aliased)
+#   Dominant - most frequent color of the block (flat regions for cross-stitch charts)
+# For the filtered modes the render plan folds the zoom into this resample, so the
+# cells come from the source in one pass.
+DOMINANT = "dominant"
+DOWNSAMPLE_MODES = ("Nearest", "Average", "Smooth", "Dominant")
+DOWNSAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "average": Image.Resampling.BOX,
+    "smooth": Image.Resampling.LANCZOS,
+    "dominant": DOMINANT,
+}
+
+# Dominant color: pixels are grouped by their top DOMINANT_BITS bits per channel before
+# counting, so near-identical shades of a photo vote for the same color
+DOMINANT_BITS = 4
+
+# Pixels handled per NumPy pass when counting dominant colors (bounds temporary memory)
+DOMINANT_CHUNK_PIXELS = 1 << 22
+
+# Large filtered reductions first shrink by an integer factor (fast box reduce) until
+# the remaining LANCZOS step is at most this ratio (see Image.resize reducing_gap)
+REDUCING_GAP = 3.0
+
+
+def pixel_geometry(size, scale):
+    """Computes the small (cell) size and the centered, scale-divisible crop box for an image size."""
+    scale = max(1, int(scale))
+    orig_width, orig_height = size
+
+    # compute target small dimensions
+    small_w = max(1, orig_width // scale)
+    small_h = max(1, orig_height // scale)
+
+    # compute target (cropped) full-size dimensions that are exact multiples of scale
+    target_w = small_w * scale
+    target_h = small_h * scale
+
+    # if original isn't divisible by scale, crop centered to make it divisible
+    left = (orig_width - target_w) // 2
+    top = (orig_height - target_h) // 2
+    return PixelGeometry((small_w, small_h), (left, top, left + target_w, top + target_h), (target_w, target_h))
+
+
+def palette_colors(palette):
+    """Target color count for an adaptive palette option, or None when the palette is not reduced."""
+    palette = str(palette).lower()
+    if palette == "none":
+        return None
+    try:
+        return int(palette)
+    except Exception:
+        return 16
+
+
+def downsample_filter(mode):
+    """
+    Resampling filter for a DOWNSAMPLE_MODES value (unknown values fall back to NEAREST),
+    or DOMINANT, which is not a Pillow filter.
+    """
+    return DOWNSAMPLE_FILTERS.get(str(mode).lower(), Image.Resampling.NEAREST)
+
+
+def is_filtered(resample):
+    """True for modes that blend pixels (a zoom or a reduced decode can be folded into them)."""
+    return resample not in (Image.Resampling.NEAREST, DOMINANT)
+
+
+def block_factor(small_size, box):
+    """
+    Integer block size when the box splits into exactly small_size blocks of whole
+    pixels (what pixel_geometry produces without zoom), otherwise None.
+    """
+    if not all(float(v).is_integer() for v in box):
+        return None
+    width, height = box[2] - box[0], box[3] - box[1]
+    factor = int(width) // small_size[0]
+    if factor < 1 or factor * small_size[0] != width or factor * small_size[1] != height:
+        return None
+    return factor
+
+
+def dominant_colors(img, small_size, box, factor):
+    """
+    Most frequent color of every factor×factor block of an RGB image inside box.
+
+    Pixels are binned by their top DOMINANT_BITS bits per channel, and each cell gets
+    the mean color of the pixels in its winning bin (ties go to the lowest bin). All
+    blocks of a strip are handled at once: the bins of each block are sorted and the
+    longest run is found with an accumulated run-start index, so there is no loop over
+    blocks in Python. Strips of cell rows keep the temporaries small.
+    """
+    small_w, small_h = small_size
+    left, top = int(box[0]), int(box[1])
+    block = factor * factor
+    shift = 8 - DOMINANT_BITS
+    positions = np.arange(block, dtype=np.int32)
+
+    strip_rows = max(1, DOMINANT_CHUNK_PIXELS // (small_w * block))
+    out = np.empty((small_h, small_w, 3), dtype=np.uint8)
+
+    for row in range(0, small_h, strip_rows):
+        rows = min(strip_rows, small_h - row)
+        y = top + row * factor
+        strip = np.asarray(img.crop((left, y, left + small_w * factor, y + rows * factor)))
+
+        # (cells, pixels per block, 3)
+        pixels = strip.reshape(rows, factor, small_w, factor, 3).transpose(0, 2, 1, 3, 4).reshape(-1, block, 3)
+        bins = pixels >> shift
+        codes = (bins[..., 0].astype(np.uint16) << (2 * DOMINANT_BITS)) | (bins[..., 1].astype(np.uint16) << DOMINANT_BITS)
+        codes |= bins[..., 2]
+
+        # Longest run of equal codes in each sorted block = its most frequent bin
+        ordered = np.sort(codes, axis=1)
+        run_start = np.zeros(ordered.shape, dtype=np.int32)
+        np.copyto(run_start[:, 1:], positions[1:], where=ordered[:, 1:] != ordered[:, :-1])
+        np.maximum.accumulate(run_start, axis=1, out=run_start)
+        run_length = positions - run_start
+        winner = ordered[np.arange(len(ordered)), run_length.argmax(axis=1)]
+
+        # Mean color of the pixels in the winning bin
+        members = codes == winner[:, None]
+        # (float32 sums of at most factor² bytes are exact; matmul is much faster than einsum here)
+        totals = np.matmul(members[:, None, :].astype(np.float32), pixels.astype(np.float32))[:, 0]
+        counts = members.sum(axis=1, dtype=np.uint32)[:, None]
+        colors = (totals.astype(np.uint32) + counts // 2) // counts
+        out[row : row + rows] = colors.reshape(rows, small_w, 3)
+
+    return Image.fromarray(out)
+
+
+def downscale(img, small_size, box, resample=Image.Resampling.NEAREST):
+    """
+    Samples the scale-divisible crop box down to one RGB pixel per cell.
+
+    Cropping and shrinking happen in a single resize with a source box (for NEAREST
+    this samples exactly like crop + resize). Averaging over whole scale×scale blocks
+    uses Image.reduce, which sums each block in C without any filter weights. The
+    conversion to RGB runs on the small image: it works pixel by pixel, so converting
+    after sampling gives the same result as converting the full-size image first.
+    """
+    left, top, right, bottom = box
+    if left < 0 or top < 0 or right > img.width or bottom > img.height:
+        # Image smaller than one cell: crop pads with black, which resize(box=...) cannot do
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img = img.crop(box)
+        box = (0, 0) + img.size
+
+    factor = block_factor(small_size, box) if resample in (Image.Resampling.BOX, DOMINANT) else None
+    if resample == DOMINANT:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if not factor:
+            # Blocks of whole pixels are needed; sample the box to an exact multiple first
+            width = small_size[0] * max(1, round((box[2] - box[0]) / small_size[0]))
+            img = img.resize((width, width // small_size[0] * small_size[1]), Image.Resampling.NEAREST, box=box)
+            factor = width // small_size[0]
+            box = (0, 0) + img.size
+        small = dominant_colors(img, small_size, box, factor)
+    elif resample == Image.Resampling.NEAREST:
+        small = img.resize(small_size, resample, box=box)
+    elif factor and img.mode in ("RGB", "L"):
+        small = img.reduce(factor, box=tuple(int(v) for v in box))
+    else:
+        small = img.resize(small_size, resample, box=box, reducing_gap=REDUCING_GAP)
+    if small.mode != "RGB":
+        small = small.convert("RGB")
+    return small
+
+
+def reduce_palette(small, palette="None", dithering="None", quantizer=DEFAULT_QUANTIZER, metric="rgb"):
+    """
+    Applies the palette reduction and dithering to the small (one pixel per cell) image.
+    Adaptive palettes are solved with the given quantizer (see gridmaker.palette.QUANTIZERS),
+    fixed palettes are matched with the given color metric ("rgb" or "lab").
+    """
+    dith = str(dithering).lower()
+    fixed = parse_palette(palette)
+    if fixed:
+        return reduce_to_fixed_palette(small, fixed, dith, metric)
+
+    target_colors = palette_colors(palette)
+
+    # Step 1: Generate the Palette Image (Base)
+    if target_colors is not None:
+        base_palette_img = quantize(small, target_colors, quantizer)
+    else:
+        base_palette_img = None
+
+    # Step 2: Apply Dithering based on mode
+    matrix = threshold_matrix(dith)
+    if matrix is not None:
+        # Ordered dithering straight against the palette (the web palette when there is none)
+        if base_palette_img:
+            return ordered_dither(
+                small,
+                used_colors(base_palette_img),
+                matrix,
+                lambda img: img.quantize(palette=base_palette_img, dither=Image.Dither.NONE),
+            )
+        return ordered_dither(small, WEB_PALETTE, matrix, lambda img: map_to_palette(img, WEB_PALETTE))
+
+    kernel = error_kernel(dith)
+    if kernel is not None:
+        # NumPy error diffusion (the web palette when there is none); an adaptive
+        # palette gets a throwaway lookup table, it is only used for this image
+        if base_palette_img:
+            colors = used_colors(base_palette_img)
+            return error_diffuse(small, colors, kernel, build_lut(colors))
+        return error_diffuse(small, WEB_PALETTE, kernel, palette_lut(WEB_PALETTE))
+
+    if dith == "floyd":
+        if base_palette_img:
+            return small.quantize(palette=base_palette_img, dither=Image.Dither.FLOYDSTEINBERG)
+        return small.convert("P", dither=Image.Dither.FLOYDSTEINBERG, palette=Image.Palette.ADAPTIVE)
+
+    # No Dithering
+    if base_palette_img:
+        return base_palette_img
+    return small
+
+
+def reduces_to_palette(palette="None", dithering="None"):
+    """True when reduce_palette returns a "P" image for these options (and not the RGB cells)."""
+    fixed = parse_palette(palette)
+    if fixed:
+        return len(fixed) <= 256
+    if palette_colors(palette) is not None:
+        return True
+    # Without a palette only dithering reduces the colors (to the web or an adaptive palette)
+    dith = str(dithering).lower()
+    return dith == "floyd" or threshold_matrix(dith) is not None or error_kernel(dith) is not None
+
+
+def reduce_to_fixed_palette(small, colors, dith="none", metric="rgb"):
+    """
+    Maps the small image onto a fixed palette (see gridmaker.palette), with optional
+    dithering. The result is a "P" image, or RGB for palettes over 256 colors.
+    """
+    if dith == "floyd":
+        # Error diffusion depends on the pixels already mapped, so it cannot be a table lookup
+        # (Pillow diffuses and matches in RGB whatever the metric; palettes it cannot hold,
+        # over 256 colors, are diffused in NumPy with the same weights, also in RGB)
+        if len(colors) > 256:
+            return error_diffuse(small, colors, FLOYD_STEINBERG, palette_lut(colors))
+        return small.quantize(palette=palette_image(colors), dither=Image.Dither.FLOYDSTEINBERG)
+    matrix = threshold_matrix(dith)
+    if matrix is not None:
+        return ordered_dither(small, colors, matrix, lambda img: map_to_palette(img, colors, metric))
+    kernel = error_kernel(dith)
+    if kernel is not None:
+        return error_diffuse(small, colors, kernel, palette_lut(colors, LUT_BITS, metric))
+    return map_to_palette(small, colors, metric)
+
+
+def sharpen_cells(small):
+    """
+    Sharpens the small (one pixel per cell) image. Done before the palette reduction, so
+    the result still only uses palette colors and the filter runs on cells, not output pixels.
+    """
+    return small.filter(ImageFilter.SHARPEN)
+
+
+def upscale(small_p, target, factor=1, keep_palette=False):
+    """
+    Scales the small image back up to the target size: first by 'factor' with an
+    edge-aware ScaleNx upscaler (see gridmaker.scalers) when factor > 1, then the rest
+    of the way with nearest-neighbor. The result is RGB: palette images are converted
+    while still small (both upscalers only repeat pixels, so this matches converting
+    afterwards), unless keep_palette asks for a "P" result.
+    """
+    if small_p.mode != "RGB" and not (keep_palette and small_p.mode == "P"):
+        small_p = small_p.convert("RGB")
+    if factor > 1:
+        small_p = scale_pixels(small_p, factor)
+    return small_p.resize(target, Image.NEAREST)
@@ -0,0 +1,465 @@
+"""
+Render plans: the settings compiled, for one input size and mode, into the list of
+operations that actually have to run.
+
+Stages that would not change the image are dropped (no padding to trim, zoom 1.0,
+RGB conversion of an RGB image) and adjacent crop + resize pairs are fused into a
+single resample with a source box:
+
+    trim → zoom (LANCZOS)       one LANCZOS resize of the trim box
+    trim → pixel art (NEAREST)  the pixel art samples the trim box directly
+
+With a filtering pixel art downsample ("Smooth") the zoom is folded in as well:
+the cells are resampled from the source in a single pass, the zoomed image is
+never built.
+
+When the first stage that reads the pixels is a filtered reduction, the plan also
+records how much smaller the source may be decoded (max_reduce) without losing
+detail the output can show; see pipeline.decode_image.
+"""
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Tuple
+
+from PIL import Image, ImageColor
+
+from .grid import draw_grid, grid_count_for_pixels
+from .labels import NumberLayout, draw_grid_numbers, number_canvas, number_layout, text_shades
+from .palette import color_metric, compact_palette, parse_palette, quantizer_name
+from .pixelart import (
+    downsample_filter,
+    downscale,
+    is_filtered,
+    palette_colors,
+    pixel_geometry,
+    reduce_palette,
+    reduces_to_palette,
+    sharpen_cells,
+    upscale,
+)
+from .scalers import upscale_factor
+
+
+# A reduced decode must still leave the first resample at least this much to shrink
+DECODE_GAP = 2.0
+
+# Source modes decoded at a reduced size (JPEG DCT scaling or Image.reduce); other
+# modes (RGBA, P, ...) are always decoded in full
+REDUCIBLE_MODES = ("RGB", "L")
+
+
+def _box(box):
+    left, top, right, bottom = (round(v, 1) for v in box)
+    return f"({left:g}, {top:g})-({right:g}, {bottom:g})"
+
+
+def _filter_name(resample):
+    return resample.upper() if isinstance(resample, str) else Image.Resampling(resample).name
+
+
+def _size(size):
+    return f"{size[0]}x{size[1]}"
+
+
+@dataclass(frozen=True)
+class Crop:
+    box: Tuple[int, int, int, int]
+    in_place = False
+
+    def apply(self, img):
+        return img.crop(self.box)
+
+    def describe(self):
+        return f"crop {_box(self.box)}"
+
+
+@dataclass(frozen=True)
+class Convert:
+    mode: str
+    in_place = False
+
+    def apply(self, img):
+        return img.convert(self.mode)
+
+    def describe(self):
+        return f"convert to {self.mode}"
+
+
+@dataclass(frozen=True)
+class Resize:
+    size: Tuple[int, int]
+    box: Any = None  # source box (fused crop) or None for the whole image
+    in_place = False
+
+    def apply(self, img):
+        return img.resize(self.size, Image.Resampling.LANCZOS, box=self.box)
+
+    def describe(self):
+        source = f" from {_box(self.box)}" if self.box else ""
+        return f"resize LANCZOS{source} to {_size(self.size)}"
+
+
+@dataclass(frozen=True)
+class PixelArt:
+    box: Tuple[float, float, float, float]  # scale-divisible source box, in input coordinates
+    small: Tuple[int, int]
+    target: Tuple[int, int]
+    resample: int
+    palette: str
+    dithering: str
+    sharpen: bool
+    quantizer: str = None  # adaptive palette solver (None for fixed palettes / no reduction)
+    metric: str = "rgb"  # color distance for fixed palettes
+    factor: int = 1  # ScaleNx sub-pixel factor of the upscale (1 = nearest-neighbor only)
+    extra_colors: Any = None  # keep a "P" result whose palette also holds these colors (None = RGB)
+    in_place = False
+
+    def apply(self, img):
+        return self.enlarge(self.reduce(self.sample(img)))
+
+    def sample(self, img):
+        """The RGB cells (one pixel per cell), sharpened when asked."""
+        small = downscale(img, self.small, self.box, self.resample)
+        return sharpen_cells(small) if self.sharpen else small
+
+    def reduce(self, small):
+        """The cells mapped to the palette ("P" image, or RGB when there is no reduction)."""
+        return reduce_palette(small, self.palette, self.dithering, self.quantizer, self.metric)
+
+    def enlarge(self, small_p):
+        """The cells upscaled to the target size (kept indexed when extra_colors is set)."""
+        if self.extra_colors is not None and small_p.mode == "P":
+            indexed = compact_palette(small_p, self.extra_colors)
+            if indexed is not None:
+                return upscale(indexed, self.target, self.factor, keep_palette=True)
+        return upscale(small_p, self.target, self.factor)
+
+    def describe(self):
+        solver = f" ({self.quantizer})" if self.quantizer else ""
+        if self.metric != "rgb":
+            solver = f" ({self.metric.capitalize()} match)"
+        lines = [f"pixel art: sample {_box(self.box)} {_filter_name(self.resample)} to {_size(self.small)} cells"]
+        if self.sharpen:
+            lines.append("sharpen cells")
+        lines.append(f"palette {self.palette}{solver}, dithering {self.dithering}")
+        scaler = f"Scale{self.factor}x + " if self.factor > 1 else ""
+        lines.append(f"upscale {scaler}NEAREST to {_size(self.target)}")
+        if self.extra_colors is not None:
+            lines.append("kept indexed (P) when its colors and the drawing colors fit in 256")
+        return ", ".join(lines)
+
+
+@dataclass(frozen=True)
+class NumberCanvas:
+    layout: NumberLayout
+    bg_color: str
+    in_place = False
+
+    def apply(self, img):
+        return number_canvas(img, self.layout, self.bg_color)
+
+    def describe(self):
+        return f"number canvas: {self.layout.margin}px margins, background {self.bg_color}"
+
+
+@dataclass(frozen=True)
+class Grid:
+    rows: int
+    color: str
+    thickness: int
+    highlight_every: int
+    offset: Tuple[int, int]
+    size: Tuple[int, int]
+    in_place = True
+
+    def apply(self, img):
+        return draw_grid(
+            img,
+            self.rows,
+            self.rows,
+            self.color,
+            self.thickness,
+            self.highlight_every,
+            offset=self.offset,
+            size=self.size,
+        )
+
+    def describe(self):
+        highlight = f", every {self.highlight_every} thicker" if self.highlight_every else ""
+        return f"grid {self.rows} cells, {self.thickness}px {self.color}{highlight} over {_size(self.size)}"
+
+
+@dataclass(frozen=True)
+class Numbers:
+    layout: NumberLayout
+    size: Tuple[int, int]
+    rows: int
+    color: str
+    bg_color: str = "#FFFFFF"
+    in_place = True
+
+    def apply(self, img):
+        return draw_grid_numbers(img, self.layout, self.size, self.rows, self.color, self.bg_color)
+
+    def describe(self):
+        return f"grid numbers {self.color}, font size {self.layout.font_size}"
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    """Compiled pipeline for one (settings, input size, input mode) combination."""
+
+    input_size: Tuple[int, int]
+    input_mode: str
+    steps: Tuple[Any, ...]
+    skipped: Tuple[str, ...]  # stages left out, with the reason
+    rows: int  # grid rows actually used (after syncing to the pixel art)
+    output_size: Tuple[int, int]
+    max_reduce: int = 1  # largest integer factor the source may be decoded smaller by
+
+    def for_decoded_size(self, size):
+        """
+        The same plan for a source decoded at a reduced size (same aspect, see max_reduce):
+        the source box of the first resample is scaled to the decoded image.
+        """
+        if tuple(size) == self.input_size:
+            return self
+        scale_x = size[0] / self.input_size[0]
+        scale_y = size[1] / self.input_size[1]
+        steps = list(self.steps)
+        for i, step in enumerate(steps):
+            if isinstance(step, Convert):
+                continue
+            left, top, right, bottom = step.box or (0, 0) + self.input_size
+            box = (left * scale_x, top * scale_y, min(right * scale_x, size[0]), min(bottom * scale_y, size[1]))
+            steps[i] = replace(step, box=box)
+            break
+        return replace(self, input_size=tuple(size), steps=tuple(steps), max_reduce=1)
+
+    def explain(self):
+        """Human-readable listing of the plan (used by `render --explain`)."""
+        indexed = any(getattr(step, "extra_colors", None) is not None for step in self.steps)
+        output_mode = "P when the colors fit in 256, otherwise RGB" if indexed else "RGB"
+        lines = [f"{_size(self.input_size)} {self.input_mode} -> {_size(self.output_size)} {output_mode}"]
+        if self.max_reduce > 1:
+            lines.append(f"  0. decode at up to 1/{self.max_reduce} size")
+        if not self.steps:
+            lines.append("  (nothing to do, the image is saved as is)")
+        for number, step in enumerate(self.steps, 1):
+            lines.append(f"  {number}. {step.describe()}")
+        for reason in self.skipped:
+            lines.append(f"  - {reason}")
+        return "\n".join(lines)
+
+
+def _drawing_colors(settings, rows):
+    """
+    RGB colors the grid and number stages will draw with (added to an indexed pixel art
+    palette): none when no grid is drawn, the number colors only when numbers are shown.
+    """
+    colors = []
+    if settings.grid_enabled and rows > 0:
+        colors.append(ImageColor.getrgb(settings.grid_color)[:3])
+        if settings.show_grid_numbers:
+            colors.append(ImageColor.getrgb(settings.grid_number_bg_color)[:3])
+            colors.extend(text_shades(settings.grid_number_text_color, settings.grid_number_bg_color))
+    return tuple(colors)
+
+
+@lru_cache(maxsize=64)
+def compile_plan(settings, size, mode="RGB", indexed=False):
+    """
+    Compiles RenderSettings for an input of the given size and mode into a RenderPlan.
+    Plans only depend on these values, so they are cached.
+
+    With indexed=True (an output format that can store palette images) palette-reduced
+    pixel art stays a "P" image through the upscale, grid and numbers, with the colors
+    those stages draw with added to its palette.
+    """
+    input_size = tuple(size)
+    width, height = input_size
+    steps = []
+    skipped = []
+    needs_convert = mode != "RGB"
+    if not needs_convert:
+        skipped.append("convert: source is already RGB")
+
+    # 1. Padding Removal (Trim)
+    h_pad = settings.h_padding  # Left/Right trim amount
+    v_pad = settings.v_padding  # Top/Bottom trim amount
+    trim = None
+    if not (h_pad or v_pad):
+        skipped.append("trim: no padding")
+    elif width > 2 * h_pad and height > 2 * v_pad:
+        trim = (h_pad, v_pad, width - h_pad, height - v_pad)
+        width, height = width - 2 * h_pad, height - 2 * v_pad
+    else:
+        skipped.append("trim: padding larger than the image")
+
+    # 2. Resize (Zoom)
+    zoom = settings.zoom_factor
+    new_width = int(width * zoom)
+    new_height = int(height * zoom)
+    zoom_size = None
+    if new_width > 0 and new_height > 0 and (new_width, new_height) != (width, height):
+        zoom_size = (new_width, new_height)
+    else:
+        skipped.append(f"zoom: factor {zoom} keeps the size")
+
+    # Pixel art cells straight from the source (one resample instead of zoom + downscale)
+    resample = downsample_filter(settings.pixel_art_downsample)
+    geometry = None
+    if settings.pixel_art_enabled and is_filtered(resample):
+        zoomed = zoom_size or (width, height)
+        geometry = pixel_geometry(zoomed, settings.pixel_art_scale)
+        if min(geometry.box) < 0:
+            geometry = None  # image smaller than one cell, keep the separate stages
+
+    if geometry:
+        # Map the cell box back through the zoom (and trim) onto the source image
+        scale_x = width / zoomed[0]
+        scale_y = height / zoomed[1]
+        left, top = trim[:2] if trim else (0, 0)
+        box = geometry.box
+        box = (
+            left + box[0] * scale_x,
+            top + box[1] * scale_y,
+            min(left + box[2] * scale_x, left + width),
+            min(top + box[3] * scale_y, top + height),
+        )
+        if zoom_size:
+            skipped.append("zoom: folded into the pixel art resample")
+        if trim:
+            skipped.append("trim: fused into the pixel art sampling")
+        trim = zoom_size = None
+        # Filtering needs RGB input
+        if needs_convert:
+            steps.append(Convert("RGB"))
+            needs_convert = False
+    elif zoom_size:
+        # LANCZOS needs RGB input; the trim box becomes the resample's source box
+        if needs_convert:
+            steps.append(Convert("RGB"))
+            needs_convert = False
+        steps.append(Resize(zoom_size, trim))
+        if trim:
+            skipped.append("trim: fused into the zoom resample")
+        trim = None
+        width, height = zoom_size
+
+    # Grid settings
+    rows = settings.grid_rows
+
+    # 3. Pixel Art
+    if settings.pixel_art_enabled:
+        if not geometry:
+            geometry = pixel_geometry((width, height), settings.pixel_art_scale)
+            box = geometry.box
+            if trim and min(box) >= 0:
+                # Sample the pixel art straight from the untrimmed image
+                box = (box[0] + trim[0], box[1] + trim[1], box[2] + trim[0], box[3] + trim[1])
+                skipped.append("trim: fused into the pixel art sampling")
+            elif trim:
+                steps.append(Crop(trim))
+            trim = None
+        if needs_convert:
+            if resample == Image.NEAREST:
+                skipped.append("convert: runs on the pixel art cells")
+            else:
+                steps.append(Convert("RGB"))  # filters and color counting need RGB input
+            needs_convert = False
+
+        # Adaptive palettes are solved by a quantizer (unavailable ones fall back),
+        # fixed palettes are matched in the chosen color space
+        quantizer = None
+        metric = "rgb"
+        if parse_palette(settings.pixel_art_palette):
+            metric = color_metric(settings.pixel_art_color_match)
+        elif palette_colors(settings.pixel_art_palette):
+            quantizer = quantizer_name(settings.pixel_art_quantizer)
+
+        # Grid count follows the pixel art dimensions
+        if settings.sync_grid_to_pixels:
+            rows = grid_count_for_pixels(*geometry.small)
+
+        # Only cells reduced to a "P" image can stay indexed (with the drawing colors added)
+        extra_colors = None
+        if indexed and reduces_to_palette(settings.pixel_art_palette, settings.pixel_art_dithering):
+            extra_colors = _drawing_colors(settings, rows)
+
+        steps.append(
+            PixelArt(
+                box,
+                geometry.small,
+                geometry.target,
+                resample,
+                settings.pixel_art_palette,
+                settings.pixel_art_dithering,
+                settings.pixel_art_sharpen,
+                quantizer,
+                metric,
+                upscale_factor(settings.pixel_art_upscaler, settings.pixel_art_scale),
+                extra_colors,
+            )
+        )
+        width, height = geometry.target
+    else:
+        skipped.append("pixel art: disabled")
+
+    if trim:
+        steps.append(Crop(trim))
+    if needs_convert:
+        steps.append(Convert("RGB"))
+
+    # --- Skip if grid disabled ---
+    if settings.grid_enabled and rows > 0:
+        size = (width, height)
+        offset = (0, 0)
+        # 4. Allocate the final canvas with number margins once, then draw everything in place
+        if settings.show_grid_numbers:
+            layout = number_layout(*size)
+            steps.append(NumberCanvas(layout, settings.grid_number_bg_color))
+            offset = (layout.margin, layout.margin)
+            width, height = width + layout.margin, height + layout.margin
+
+        # 5. Draw grid (always square)
+        steps.append(
+            Grid(rows, settings.grid_color, settings.grid_thickness, settings.grid_highlight_every, offset, size)
+        )
+
+        # 6. Grid numbers
+        if settings.show_grid_numbers:
+            steps.append(Numbers(layout, size, rows, settings.grid_number_text_color, settings.grid_number_bg_color))
+        else:
+            skipped.append("grid numbers: off")
+    else:
+        skipped.append("grid: disabled" if not settings.grid_enabled else "grid: 0 rows")
+
+    max_reduce = _max_reduce(steps, input_size, mode)
+    return RenderPlan(input_size, mode, tuple(steps), tuple(skipped), rows, (width, height), max_reduce)
+
+
+def _max_reduce(steps, input_size, mode):
+    """
+    Largest integer factor the source can be shrunk by before the plan runs.
+    Only for REDUCIBLE_MODES sources and when the first step that reads the pixels is a
+    filtered resample (zoom or Smooth pixel art): it averages anyway, so a DCT-scaled /
+    box-reduced source that keeps DECODE_GAP× the output resolution looks the same.
+    NEAREST / dominant sampling and trims at full size need the exact pixels.
+    """
+    if mode not in REDUCIBLE_MODES:
+        return 1
+    for step in steps:
+        if isinstance(step, Convert):
+            continue
+        if isinstance(step, Resize):
+            out_size = step.size
+        elif isinstance(step, PixelArt) and is_filtered(step.resample):
+            out_size = step.small
+        else:
+            return 1
+        left, top, right, bottom = step.box or (0, 0) + input_size
+        ratio = min((right - left) / out_size[0], (bottom - top) / out_size[1])
+        return max(1, int(ratio / DECODE_GAP))
+    return 1
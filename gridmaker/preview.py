@@ -0,0 +1,284 @@
+"""
+Stage-level memoization for the interactive preview.
+
+The preview renders the same file again and again while one setting at a time
+changes. A render runs these stages:
+
+    decode → convert → trim → zoom → pixel art sample → palette → upscale → canvas → grid → numbers
+
+Each stage declares what it depends on with its key: the decode depends on the file
+(path, mtime) and the reduced-decode factor, every later stage on the settings
+values it reads (the fields of its compiled plan step, see plan.compile_plan) and on
+the key of its input. Keys are chained, so a changed setting misses the first stage
+that reads it and every stage downstream of it.
+
+Most stages output a full-resolution image, so StageCache does not keep them all: it
+keeps the decode, the pixel art cells (one pixel per cell, small) and the inputs of
+the grid and numbers stages. Restyling the grid or number colors then only redraws
+the grid and the numbers, a new palette reuses the sampled cells, and other changes
+re-run the cheap stages from the decode.
+
+PreviewWorker runs the renders on a background thread so the UI never waits for
+them. Only the latest request matters: a newer one replaces a request that has not
+started yet and stops a running render at its next stage boundary.
+
+When a new file is shown, StageCache.proxy first renders an approximate version
+from a reduced decode (a few hundred pixels wide, with padding, pixel scale and
+grid thickness scaled along), which is displayed until the exact render is done.
+"""
+
+import os
+import threading
+
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+from .palette import palette_hex, parse_palette, solve_palette
+from .pipeline import decode_image
+from .plan import Convert, Crop, Grid, NumberCanvas, Numbers, PixelArt, Resize, compile_plan
+from .pixelart import palette_colors
+
+# Cache slot of each plan step (one entry per slot: the last render's output)
+STAGE_NAMES = {
+    Convert: "convert",
+    Crop: "trim",
+    Resize: "zoom",
+    NumberCanvas: "canvas",
+    Grid: "grid",
+    Numbers: "numbers",
+}
+
+# Longest side a proxy is rendered at (about the preview window width); smaller
+# sources are rendered exactly straight away
+PROXY_SIZE = 800
+# Longest side of the thumbnail a proxy's adaptive palette is solved on
+PROXY_PALETTE_SAMPLE = 128
+# Smallest grid cell (in proxy pixels) whose lines are drawn on a proxy
+PROXY_MIN_CELL = 4
+
+
+class RenderCancelled(Exception):
+    """Raised when a render is abandoned because its should_stop callback returned True."""
+
+
+def plan_stages(step):
+    """
+    The memoized stages of a plan step, as (name, key, function) tuples.
+    The key holds the values the stage depends on.
+    """
+    if isinstance(step, PixelArt):
+        return (
+            ("sample", (step.box, step.small, step.resample, step.sharpen), step.sample),
+            ("palette", (step.palette, step.dithering, step.quantizer, step.metric), step.reduce),
+            ("upscale", (step.target, step.factor, step.extra_colors), step.enlarge),
+        )
+    return ((STAGE_NAMES[type(step)], step, step.apply),)
+
+
+def proxy_settings(settings, factor):
+    """The settings for a source 'factor' times smaller: pixel sizes shrink along, counts stay."""
+    return settings.replace(
+        h_padding=round(settings.h_padding / factor),
+        v_padding=round(settings.v_padding / factor),
+        pixel_art_scale=max(1, round(settings.pixel_art_scale / factor)),
+        grid_thickness=max(1, round(settings.grid_thickness / factor)),
+    )
+
+
+class StageCache:
+    """
+    Renders files like pipeline.render_image, keeping the stage outputs worth keeping
+    (see the module docstring) so the next render with partly changed settings only
+    re-runs the stages that depend on them.
+
+    Holds the decoded source and up to two full-resolution stage outputs; outputs that
+    a render can no longer reuse are dropped as soon as its keys diverge. Not
+    thread-safe: use one cache per thread. Returned images may be owned by the cache
+    and must not be modified.
+    """
+
+    def __init__(self):
+        self._stages = {}  # stage name -> (key, image)
+
+    def _lookup(self, name, key):
+        entry = self._stages.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        return None
+
+    def _decode(self, path, settings):
+        """The decode stage: (key, decoded image, file image size)."""
+        with Image.open(path) as src:
+            size, mode = src.size, src.mode
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns, compile_plan(settings, size, mode).max_reduce)
+        img = self._lookup("decode", key)
+        if img is None:
+            img, _ = decode_image(path, settings)
+            self._stages["decode"] = (key, img)
+        return key, img, size
+
+    def proxy(self, path, settings):
+        """
+        Renders a quick approximation of render(path, settings) from the source reduced
+        to about PROXY_SIZE pixels, with the settings scaled along (see proxy_settings).
+        JPEGs are decoded directly at the reduced size (DCT scaling); other formats can
+        only be decoded in full, so they go through the decode stage, which render()
+        then reuses.
+
+        :return: (approximate image, grid rows), or None for sources that are not much
+                 larger than a proxy (rendering them exactly is about as quick).
+        """
+        with Image.open(path) as src:
+            size = src.size
+            if max(size) < 2 * PROXY_SIZE:
+                return None
+            if isinstance(src, JpegImageFile):
+                # draft picks the smallest DCT scale still at least this large (down to 1/8)
+                half = PROXY_SIZE / (2 * max(size))
+                src.draft(src.mode, (int(size[0] * half), int(size[1] * half)))
+                src.load()
+                img = src
+            else:
+                img = None
+        if img is None:
+            _, img, _ = self._decode(path, settings)
+
+        reduce = max(img.size) // PROXY_SIZE
+        if reduce > 1:
+            img = img.reduce(reduce) if img.mode in ("RGB", "L") else img.convert("RGB").reduce(reduce)
+
+        settings = proxy_settings(settings, size[0] / img.width)
+        colors = palette_colors(settings.pixel_art_palette)
+        if settings.pixel_art_enabled and colors and parse_palette(settings.pixel_art_palette) is None:
+            # The cell count does not shrink with the source, so solve the adaptive palette
+            # on a thumbnail and map the cells to it as a fixed palette (like a shared palette)
+            sample = img if img.mode == "RGB" else img.convert("RGB")
+            sample = sample.reduce(max(1, max(sample.size) // PROXY_PALETTE_SAMPLE))
+            colors = solve_palette(sample, colors, settings.pixel_art_quantizer)
+            settings = settings.replace(pixel_art_palette=palette_hex(colors))
+
+        plan = compile_plan(settings, img.size, img.mode)
+        # A cached decode must not be drawn into; a reduced copy may
+        owned = reduce > 1
+        for step in plan.steps:
+            # Lines only a few pixels apart would cover the whole proxy, while the exact
+            # render shown at this size keeps them faint: leave them out
+            if isinstance(step, Grid) and max(step.size) < PROXY_MIN_CELL * step.rows:
+                continue
+            if step.in_place and not owned:
+                img = img.copy()
+            img = step.apply(img)
+            owned = True
+        return img, plan.rows
+
+    def render(self, path, settings, should_stop=None):
+        """
+        Renders an image file with the settings.
+
+        :param should_stop: Optional callable, checked before every stage.
+        :return: (rendered RGB image, grid rows actually used), as render_image
+        :raises RenderCancelled: when should_stop returns True (kept stages finished so far stay cached).
+        """
+        key, img, size = self._decode(path, settings)
+        used = {"decode": (key, img)}
+        plan = compile_plan(settings, size, img.mode).for_decoded_size(img.size)
+        stages = [(step,) + stage for step in plan.steps for stage in plan_stages(step)]
+
+        # Kept: the small pixel art cells and the inputs of the grid and numbers steps
+        keep = {"sample", "palette"}
+        for (_, name, _, _), (step, _, _, _) in zip(stages, stages[1:]):
+            if isinstance(step, (Grid, Numbers)):
+                keep.add(name)
+
+        keys = []
+        for _, _, depends, _ in stages:
+            key = (key, depends)
+            keys.append(key)
+
+        # Resume after the last stage still cached; every kept output after it is keyed on
+        # the old settings, so it is dropped before anything is rendered
+        start = 0
+        for index in range(len(stages) - 1, -1, -1):
+            cached = self._lookup(stages[index][1], keys[index])
+            if cached is not None:
+                img, start = cached, index + 1
+                break
+        for (_, name, _, _), key in zip(stages[:start], keys):
+            cached = self._lookup(name, key)
+            if cached is not None:
+                used[name] = (key, cached)
+        self._stages = used
+
+        # 'owned' is False while img is kept in the cache, which in-place steps must copy
+        owned = False
+        for (step, name, _, apply), key in zip(stages[start:], keys[start:]):
+            if should_stop and should_stop():
+                raise RenderCancelled()
+            img = apply(img if owned or not step.in_place else img.copy())
+            owned = name not in keep
+            if not owned:
+                used[name] = (key, img)
+
+        return img, plan.rows
+
+
+class PreviewWorker:
+    """
+    Background thread running preview jobs, latest request wins.
+
+    A job is a callable taking a should_stop callable (True once a newer job has been
+    submitted) and returning the result; it may raise RenderCancelled to give up.
+    on_done(result, error) is called on the worker thread, and only for a job that is
+    still the latest one, so the caller just hands it over to its UI thread.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = None  # (generation, job, on_done) not started yet
+        self._generation = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="gridmaker-preview", daemon=True)
+        self._thread.start()
+
+    def submit(self, job, on_done):
+        """Queues a job, replacing any queued one and cancelling the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, job, on_done)
+            self._condition.notify()
+
+    def cancel(self):
+        """Cancels the running job and drops the queued one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        """Cancels the running job, drops the queued one and ends the thread."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._closed = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                generation, job, on_done = self._pending
+                self._pending = None
+
+            def should_stop():
+                return self._generation != generation
+
+            try:
+                result, error = job(should_stop), None
+            except RenderCancelled:
+                continue
+            except Exception as e:
+                result, error = None, e
+            if not should_stop():
+                on_done(result, error)
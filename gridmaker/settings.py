@@ -0,0 +1,68 @@
+from dataclasses import asdict, dataclass, fields, replace
+
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """
+    Immutable snapshot of every setting the render pipeline reads.
+
+    Captured once per batch or preview render (on the Tk thread) and passed down
+    the whole pipeline, so worker code never touches Tk variables. Being frozen
+    and hashable it can also be used directly as a cache key.
+    """
+
+    h_padding: int = 0
+    v_padding: int = 0
+    zoom_factor: float = 1.0
+    grid_color: str = "#000000"
+    grid_rows: int = 100
+    show_grid_numbers: bool = True
+    grid_number_text_color: str = "#000000"
+    grid_number_bg_color: str = "#FFFFFF"
+    grid_enabled: bool = True
+    grid_thickness: int = 1
+    grid_highlight_every: int = 0
+    pixel_art_enabled: bool = True
+    pixel_art_scale: int = 8
+    pixel_art_palette: str = "None"
+    pixel_art_dithering: str = "None"
+    pixel_art_sharpen: bool = False
+    pixel_art_downsample: str = "Nearest"
+    pixel_art_shared_palette: bool = False
+    pixel_art_quantizer: str = "Median Cut"
+    pixel_art_color_match: str = "RGB"
+    pixel_art_upscaler: str = "Nearest"
+    sync_grid_to_pixels: bool = True
+
+    @classmethod
+    def from_mapping(cls, values):
+        """
+        Builds a snapshot from a mapping of setting name → value (config file, Tk variables, ...).
+        Unknown keys are ignored, missing keys keep their defaults and values are coerced
+        to the field type (e.g. a slider's 12.0 becomes 12).
+        """
+        kwargs = {}
+        for f in fields(cls):
+            if f.name in values:
+                value = values[f.name]
+                if f.type is int:
+                    value = int(round(float(value)))
+                elif f.type is float:
+                    value = float(value)
+                elif f.type is bool:
+                    if isinstance(value, str):
+                        value = value.strip().lower() in ("1", "true", "yes", "on")
+                    else:
+                        value = bool(value)
+                else:
+                    value = str(value)
+                kwargs[f.name] = value
+        return cls(**kwargs)
+
+    def to_dict(self):
+        """Returns the settings as a plain dictionary (config file layout)."""
+        return asdict(self)
+
+    def replace(self, **changes):
+        """Returns a copy with the given settings changed."""
+        return replace(self, **changes)
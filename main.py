@@ -5,40 +5,43 @@ import json
 import math
 import time
 import threading
+import multiprocessing
 import webbrowser
-from PIL import Image, ImageDraw, ImageTk, ImageFont, ImageFilter
+from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import colorchooser, messagebox
 import customtkinter as ctk
-from customtkinter import filedialog, CTkImage
+from customtkinter import filedialog
 from idlelib.tooltip import Hovertip
+from gridmaker import BatchError, RenderSettings, plan_batch, run_batch
+from gridmaker.batch import BACKENDS, DEFAULT_BACKEND, DEFAULT_WORKERS, shared_palette
+from gridmaker.pipeline import SUPPORTED_FORMATS, render_image, unique_path
+from gridmaker.preview import PreviewWorker, RenderCancelled, StageCache
+from gridmaker.palette import COLOR_METRICS, available_quantizers, parse_palette
+from gridmaker.pixelart import DOWNSAMPLE_MODES
+from gridmaker.scalers import UPSCALE_MODES
 
 APP_VERSION = "2.7.0"
 APP_NAME = "Grid Maker"
 CONFIG_FILENAME = "config.json"
+# Palette menu entry that asks for a list of hex colors
+CUSTOM_PALETTE_OPTION = "Custom..."
+# Caption of the quick approximate preview shown while the exact render runs
+PROXY_LABEL = "Approximate preview - rendering full quality..."
+# The preview is drawn in square tiles of this size (display pixels); only the tiles
+# on screen plus this many rows/columns around them are resampled and kept
+PREVIEW_TILE_SIZE = 256
+PREVIEW_TILE_MARGIN = 1
 
 # Default configuration structure
+# (render settings and their defaults are defined once, in gridmaker.RenderSettings)
 DEFAULT_CONFIG = {
     "app_name": APP_NAME,
     "app_version": APP_VERSION,
     "folder_path": "",
-    "h_padding": 0,
-    "v_padding": 0,
-    "zoom_factor": 1.0,
-    "grid_color": "#000000",
-    "grid_rows": 100,
-    "show_grid_numbers": True,
-    "grid_number_text_color": "#000000",
-    "grid_number_bg_color": "#FFFFFF",
-    "grid_enabled": True,
-    "grid_thickness": 1,
-    "grid_highlight_every": 0,
-    "pixel_art_enabled": True,
-    "pixel_art_scale": 8,
-    "pixel_art_palette": "None",
-    "pixel_art_dithering": "None",
-    "pixel_art_sharpen": False,
-    "sync_grid_to_pixels": True,
+    **RenderSettings().to_dict(),
+    "batch_workers": DEFAULT_WORKERS,  # 0 = one worker per CPU core
+    "batch_backend": DEFAULT_BACKEND,  # "thread" or "process"
 }
 
 # Determine configuration directory based on OS
@@ -56,41 +59,52 @@ APP_LOCK_DIR = os.path.join(os.getenv("LOCALAPPDATA", os.getenv("HOME", "/tmp"))
 LOCK_FILE = os.path.join(APP_LOCK_DIR, "app.lock")
 LOCK_TIMEOUT_SECONDS = 60
 
-os.makedirs(APP_LOCK_DIR, exist_ok=True)
 IS_LOCK_CREATED = False
 
-if os.path.exists(LOCK_FILE):
-    try:
-        lock_age = time.time() - os.path.getmtime(LOCK_FILE)
 
-        if lock_age > LOCK_TIMEOUT_SECONDS:
-            os.remove(LOCK_FILE)
-            print(f"Removed stale lock file (Age: {int(lock_age)}s).")
-        else:
-            try:
-                temp_root = tk.Tk()
-                temp_root.withdraw()
-                messagebox.showwarning(
-                    f"{APP_NAME} v{APP_VERSION}",
-                    f"{APP_NAME} is already running.\nOnly one instance is allowed.",
-                )
-                temp_root.destroy()
-            except Exception:
-                print("Application is already running.")
+def acquire_instance_lock():
+    """
+    Creates the single-instance lock file, or exits if another instance holds a fresh lock.
+    Only called when running as the application: batch worker processes import this
+    module too and must not take (or trip over) the lock.
+    """
+    global IS_LOCK_CREATED
+
+    os.makedirs(APP_LOCK_DIR, exist_ok=True)
+
+    if os.path.exists(LOCK_FILE):
+        try:
+            lock_age = time.time() - os.path.getmtime(LOCK_FILE)
+
+            if lock_age > LOCK_TIMEOUT_SECONDS:
+                os.remove(LOCK_FILE)
+                print(f"Removed stale lock file (Age: {int(lock_age)}s).")
+            else:
+                try:
+                    temp_root = tk.Tk()
+                    temp_root.withdraw()
+                    messagebox.showwarning(
+                        f"{APP_NAME} v{APP_VERSION}",
+                        f"{APP_NAME} is already running.\nOnly one instance is allowed.",
+                    )
+                    temp_root.destroy()
+                except Exception:
+                    print("Application is already running.")
+
+                sys.exit(0)
 
+        except Exception as e:
+            print(f"Error checking lock file: {e}. Exiting.")
             sys.exit(0)
 
+    try:
+        with open(LOCK_FILE, "w") as f:
+            f.write(str(os.getpid()))
+        IS_LOCK_CREATED = True
     except Exception as e:
-        print(f"Error checking lock file: {e}. Exiting.")
-        sys.exit(0)
+        print(f"Could not create lock file: {e}")
+        sys.exit(1)
 
-try:
-    with open(LOCK_FILE, "w") as f:
-        f.write(str(os.getpid()))
-    IS_LOCK_CREATED = True
-except Exception as e:
-    print(f"Could not create lock file: {e}")
-    sys.exit(1)
 
 # --- Single Instance Logic END with Timeout ---
 
@@ -149,7 +163,14 @@ class GridMaker(ctk.CTk):
             "pixel_art_palette": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_palette"]),
             "pixel_art_dithering": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_dithering"]),
             "pixel_art_sharpen": ctk.BooleanVar(value=DEFAULT_CONFIG["pixel_art_sharpen"]),
+            "pixel_art_downsample": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_downsample"]),
+            "pixel_art_shared_palette": ctk.BooleanVar(value=DEFAULT_CONFIG["pixel_art_shared_palette"]),
+            "pixel_art_quantizer": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_quantizer"]),
+            "pixel_art_color_match": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_color_match"]),
+            "pixel_art_upscaler": ctk.StringVar(value=DEFAULT_CONFIG["pixel_art_upscaler"]),
             "sync_grid_to_pixels": ctk.BooleanVar(value=DEFAULT_CONFIG["sync_grid_to_pixels"]),
+            "batch_workers": ctk.IntVar(value=DEFAULT_CONFIG["batch_workers"]),
+            "batch_backend": ctk.StringVar(value=DEFAULT_CONFIG["batch_backend"]),
         }
         # cols no longer has its own slider → always same as rows
         self.settings["grid_cols"] = self.settings["grid_rows"]
@@ -161,12 +182,22 @@ class GridMaker(ctk.CTk):
         # preview-only state
         self._preview_scale = 1.0
         self._preview_scale_min = 1.0
-        self._preview_scale_max = 4.0
+        self._preview_scale_max = 16.0  # tiled display: cost follows the window, not the zoom
         self._preview_zoom_target = None  # "center" or "mouse" or None
         self._preview_before_abs = None  # (abs_x_before, abs_y_before)
         self._preview_before_bbox = None  # bbox before zoom
         self._preview_mouse_x = None  # last mouse pos on canvas (pixels)
         self._preview_mouse_y = None
+        self.last_render = None  # full-resolution render shown in the preview
+        self._preview_render_key = None  # (path, mtime, settings) last_render was made from
+        self._preview_rows = None  # grid rows used by last_render
+        self._preview_proxy = None  # approximate image shown while last_render is being replaced
+        self._preview_tiles = {}  # (column, row) -> (PhotoImage, canvas item) of the displayed tiles
+        self._preview_tiles_source = None  # image the tiles are resampled from
+        self._preview_display_size = None  # (width, height) of the whole displayed image
+        self._preview_stages = StageCache()  # per-stage outputs, so a restyle only re-runs what changed
+        self._preview_worker = PreviewWorker()  # renders off the Tk thread, latest request wins
+        self._preview_request = 0  # number of the latest render request
 
         # Load config to overwrite default variable values
         self.load_config()
@@ -190,9 +221,8 @@ class GridMaker(ctk.CTk):
         if not os.path.isdir(folder):
             self.preview_button.configure(state="disabled")
             return
-        supported = (".png", ".jpg", ".jpeg", ".avif", ".webp")
         files = [
-            f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(supported)
+            f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(SUPPORTED_FORMATS)
         ]
         if len(files) > 0:
             self.preview_button.configure(state="normal")
@@ -279,7 +309,14 @@ class GridMaker(ctk.CTk):
             "pixel_art_palette": self.settings["pixel_art_palette"].get(),
             "pixel_art_dithering": self.settings["pixel_art_dithering"].get(),
             "pixel_art_sharpen": self.settings["pixel_art_sharpen"].get(),
+            "pixel_art_downsample": self.settings["pixel_art_downsample"].get(),
+            "pixel_art_shared_palette": self.settings["pixel_art_shared_palette"].get(),
+            "pixel_art_quantizer": self.settings["pixel_art_quantizer"].get(),
+            "pixel_art_color_match": self.settings["pixel_art_color_match"].get(),
+            "pixel_art_upscaler": self.settings["pixel_art_upscaler"].get(),
             "sync_grid_to_pixels": self.settings["sync_grid_to_pixels"].get(),
+            "batch_workers": self.settings["batch_workers"].get(),
+            "batch_backend": self.settings["batch_backend"].get(),
         }
 
         try:
@@ -289,63 +326,21 @@ class GridMaker(ctk.CTk):
         except Exception as e:
             print(f"Error saving configuration: {e}")
 
-    def _draw_grid(self, img, rows, cols, color):
+    def _collect_settings(self):
         """
-        Draws a grid on the given PIL image object.
-        Tries to keep cells square and covers the entire image.
-        If rows or cols is zero, grid drawing is skipped.
+        Captures an immutable RenderSettings snapshot from the UI variables.
+        Must be called on the Tk thread; the snapshot is then safe to hand to any worker.
+        """
+        return RenderSettings.from_mapping({key: var.get() for key, var in self.settings.items()})
+
+    def _render_preview_image(self, progressive=False):
         """
+        Requests a render of the currently selected image from the preview worker.
+        The settings are captured here on the Tk thread; the result is displayed by
+        _on_preview_rendered once it arrives, unless a newer request superseded it.
 
-        width, height = img.size
-        draw = ImageDraw.Draw(img)
-
-        # grid thickness
-        thickness = self.settings["grid_thickness"].get()
-
-        # grid highlight
-        highlight_every = self.settings["grid_highlight_every"].get()
-
-        # base square size (try to keep cells square)
-        cell_w = width / cols
-        cell_h = height / rows
-        cell_size = max(cell_w, cell_h)
-
-        # how many cells needed to cover full image
-        cols_needed = int(math.ceil(width / cell_size))
-        rows_needed = int(math.ceil(height / cell_size))
-
-        # draw horizontal lines (y)
-        for r in range(rows_needed):
-            y = r * cell_size
-            line_thickness = thickness
-            if highlight_every and r % highlight_every == 0:
-                line_thickness += 1
-            draw.line([(0, y), (width, y)], fill=color, width=line_thickness)
-
-        # draw last horizontal line
-        line_thickness = thickness
-        if highlight_every and rows_needed % highlight_every == 0:
-            line_thickness += 1
-        draw.line([(0, height), (width, height)], fill=color, width=line_thickness)
-
-        # draw vertical lines (x)
-        for c in range(cols_needed):
-            x = c * cell_size
-            line_thickness = thickness
-            if highlight_every and c % highlight_every == 0:
-                line_thickness += 1
-            draw.line([(x, 0), (x, height)], fill=color, width=line_thickness)
-
-        # draw last vertical line
-        line_thickness = thickness
-        if highlight_every and cols_needed % highlight_every == 0:
-            line_thickness += 1
-        draw.line([(width, 0), (width, height)], fill=color, width=line_thickness)
-
-        return img
-
-    def _render_preview_image(self):
-        """Render the currently selected image into the preview window using CTkImage."""
+        :param progressive: Show a quick approximate proxy first (when switching images).
+        """
         if not (hasattr(self, "preview_files") and self.preview_files):
             return
 
@@ -353,46 +348,77 @@ class GridMaker(ctk.CTk):
         self._preview_scale = getattr(self, "_preview_scale", 1.0)
 
         img_path = self.preview_files[self.preview_index]
+        files = list(self.preview_files)
+        settings = self._collect_settings()
+        self._preview_request += 1
+        request = self._preview_request
+
+        # Runs on the worker thread: the same pipeline as the batch process
+        def job(should_stop):
+            # Same folder-wide palette as the batch will use (solved once, then cached)
+            resolved = shared_palette(files, settings, should_stop=should_stop)
+            if should_stop():
+                raise RenderCancelled()
+            # The full-resolution result only changes with the file or the (resolved) settings
+            key = self._preview_key(img_path, resolved)
+            if key == self._preview_render_key:
+                return key, None, None  # already displayed
+            if progressive:
+                proxy = self._preview_stages.proxy(img_path, resolved)
+                if proxy is not None and not should_stop():
+                    self.after(0, lambda: self._on_preview_proxy(request, proxy[0]))
+            img, rows = self._preview_stages.render(img_path, resolved, should_stop)
+            return key, img, rows
+
+        def on_done(result, error):
+            self.after(0, lambda: self._on_preview_rendered(request, settings, result, error))
+
+        self._preview_worker.submit(job, on_done)
+
+    def _preview_key(self, img_path, settings):
+        """Identifies a full-resolution preview render: file, modification time and resolved settings."""
+        return (os.path.abspath(img_path), os.stat(img_path).st_mtime_ns, settings)
+
+    def _on_preview_proxy(self, request, img):
+        """Shows the approximate proxy of a render still in progress (Tk thread)."""
+        if request != self._preview_request:
+            return
+        if not (hasattr(self, "preview_window") and self.preview_window.winfo_exists()):
+            return
+        self._preview_proxy = img
+        self._show_preview_image()
 
-        try:
-            img = Image.open(img_path).convert("RGB")
-        except Exception as e:
-            print(f"Preview load error: {e}")
+    def _on_preview_rendered(self, request, settings, result, error):
+        """Displays a finished preview render (Tk thread). Results of superseded requests are dropped."""
+        if request != self._preview_request:
+            return
+        if not (hasattr(self, "preview_window") and self.preview_window.winfo_exists()):
+            return
+        self._preview_proxy = None
+        if error is not None:
+            print(f"Preview render error: {error}")
+            self._show_preview_image()
             return
 
-        # Load settings
-        h_pad = self.settings["h_padding"].get()
-        v_pad = self.settings["v_padding"].get()
-        zoom = self.settings["zoom_factor"].get()
-        grid_color = self.settings["grid_color"].get()
-        rows = self.settings["grid_rows"].get()
-        cols = rows  # always square grid
-
-        # Crop padding
-        width, height = img.size
-        if width > 2 * h_pad and height > 2 * v_pad:
-            img = img.crop((h_pad, v_pad, width - h_pad, height - v_pad))
-
-        # Apply zoom
-        width, height = img.size
-        new_width = int(width * zoom)
-        new_height = int(height * zoom)
-        if new_width > 0 and new_height > 0:
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        # Apply Pixel Art
-        if self.settings["pixel_art_enabled"].get():
-            img = self._apply_pixel_art(img)
-            rows = self.settings["grid_rows"].get()
-            cols = rows
-
-        # --- Skip if grid disabled ---
-        if self.settings.get("grid_enabled").get() and rows > 0:
-            # Draw grid
-            img = self._draw_grid(img, rows, cols, grid_color)
-            # --- Apply grid numbers if enabled
-            if self.settings["show_grid_numbers"].get():
-                img = self._apply_grid_numbers(img)
+        key, img, rows = result
+        if img is not None:
+            self.last_render, self._preview_rows, self._preview_render_key = img, rows, key
+
+        # Reflect the synced grid count in the UI controls
+        if settings.pixel_art_enabled and settings.sync_grid_to_pixels:
+            self._update_grid_controls(self._preview_rows)
+
+        self._show_preview_image()
+
+    def _show_preview_image(self):
+        """
+        Displays self.last_render (or the proxy standing in for it) at the current preview
+        scale. Only resamples the cached render for display, so zooming never re-runs the pipeline.
+        """
+        proxy = self._preview_proxy is not None
+        img = self._preview_proxy if proxy else self.last_render
+        if img is None:
+            return
 
         # Resize to fit preview window (apply preview-only scale)
         try:
@@ -429,27 +455,26 @@ class GridMaker(ctk.CTk):
             self._preview_scale = 1.0
             scale = 1.0
 
-        final_img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-
-        # Convert to CTkImage (fix HighDPI warning)
-        ctk_img = CTkImage(light_image=final_img, dark_image=final_img, size=(target_width, target_height))
+        # The display is drawn in tiles resampled on demand (see _fill_preview_tiles);
+        # a new image or display size invalidates them
+        if img is not self._preview_tiles_source or (target_width, target_height) != self._preview_display_size:
+            self._clear_preview_tiles()
+            self._preview_tiles_source = img
+            self._preview_display_size = (target_width, target_height)
 
-        self.last_render = img
-        self.preview_image_label.configure(image=ctk_img)
-        self.preview_image_label.image = ctk_img  # prevent garbage collection
+        # Tag the proxy so it is never mistaken for the final output
+        self.preview_status_label.configure(text=PROXY_LABEL if proxy else "")
 
         # update canvas scrollregion
         try:
-            # run idle tasks to ensure widget sizes updated
-            self.preview_frame.update_idletasks()
             # old bbox MAY be stored in self._preview_before_bbox (set before zoom)
-            self.preview_canvas.configure(scrollregion=self.preview_canvas.bbox("all"))
+            self.preview_canvas.configure(scrollregion=self._preview_content_bbox())
             # if a zoom action occurred, recenter accordingly
             if getattr(self, "_preview_zoom_target", None) is not None:
                 before_bbox = getattr(self, "_preview_before_bbox", None)
                 before_abs = getattr(self, "_preview_before_abs", None)
                 # bbox after
-                after_bbox = self.preview_canvas.bbox("all") or (0, 0, 1, 1)
+                after_bbox = self._preview_content_bbox()
 
                 if before_bbox and before_abs:
                     bx1, by1, bx2, by2 = before_bbox
@@ -515,11 +540,59 @@ class GridMaker(ctk.CTk):
         except Exception:
             pass
 
+        self._fill_preview_tiles()
+
+    def _preview_content_bbox(self):
+        """Bounding box of the whole displayed image on the preview canvas (tiles cover only part of it)."""
+        width, height = self._preview_display_size or (1, 1)
+        return (0, 0, width, height)
+
+    def _clear_preview_tiles(self):
+        if hasattr(self, "preview_canvas") and self.preview_canvas.winfo_exists():
+            self.preview_canvas.delete("tile")
+        self._preview_tiles = {}
+
+    def _fill_preview_tiles(self):
+        """
+        Draws the display tiles intersecting the visible canvas area (plus a margin of
+        PREVIEW_TILE_MARGIN tiles) and drops all others. Each tile is a LANCZOS resample
+        of its own source box, so display time and memory follow the window size, not
+        the zoom level. Called after every zoom, pan, scroll and resize.
+        """
+        img = self._preview_tiles_source
+        if img is None or not (hasattr(self, "preview_canvas") and self.preview_canvas.winfo_exists()):
+            return
+
+        canvas = self.preview_canvas
+        width, height = self._preview_display_size
+        tile = PREVIEW_TILE_SIZE
+        margin = PREVIEW_TILE_MARGIN * tile
+        left = max(0, int(canvas.canvasx(0)) - margin)
+        top = max(0, int(canvas.canvasy(0)) - margin)
+        right = min(width, int(canvas.canvasx(canvas.winfo_width())) + margin)
+        bottom = min(height, int(canvas.canvasy(canvas.winfo_height())) + margin)
+        wanted = {
+            (col, row) for col in range(left // tile, -(-right // tile)) for row in range(top // tile, -(-bottom // tile))
+        }
+
+        for index in set(self._preview_tiles) - wanted:
+            canvas.delete(self._preview_tiles.pop(index)[1])
+
+        scale_x = img.width / width
+        scale_y = img.height / height
+        for col, row in sorted(wanted - set(self._preview_tiles)):
+            x0, y0 = col * tile, row * tile
+            x1, y1 = min(x0 + tile, width), min(y0 + tile, height)
+            box = (x0 * scale_x, y0 * scale_y, x1 * scale_x, y1 * scale_y)
+            photo = ImageTk.PhotoImage(img.resize((x1 - x0, y1 - y0), Image.Resampling.LANCZOS, box=box))
+            item = canvas.create_image(x0, y0, image=photo, anchor="nw", tags="tile")
+            self._preview_tiles[(col, row)] = (photo, item)  # keep the PhotoImage alive
+
     def _center_preview_on_canvas(self):
         try:
             self.preview_canvas.update_idletasks()
 
-            x1, y1, x2, y2 = self.preview_canvas.bbox("all")
+            x1, y1, x2, y2 = self._preview_content_bbox()
             content_w = x2 - x1
             content_h = y2 - y1
 
@@ -546,13 +619,14 @@ class GridMaker(ctk.CTk):
         if hasattr(self, "preview_window") and self.preview_window.winfo_exists():
             self.preview_canvas.yview_moveto(0)
             self.preview_canvas.xview_moveto(0)
+            self._fill_preview_tiles()
 
     def _preview_next(self):
         if self.preview_index < len(self.preview_files) - 1:
             self.preview_index += 1
             self._preview_scale = 1.0
             self._reset_scrollbar()
-            self._render_preview_image()
+            self._render_preview_image(progressive=True)
             self._update_preview_nav_buttons()
 
     def _preview_prev(self):
@@ -560,7 +634,7 @@ class GridMaker(ctk.CTk):
             self.preview_index -= 1
             self._preview_scale = 1.0
             self._reset_scrollbar()
-            self._render_preview_image()
+            self._render_preview_image(progressive=True)
             self._update_preview_nav_buttons()
 
     def _preview_restyle(self):
@@ -589,7 +663,7 @@ class GridMaker(ctk.CTk):
 
         self._preview_scale = min(cur * 1.25, self._preview_scale_max)
         self._preview_zoom_target = target
-        self._render_preview_image()
+        self._show_preview_image()
         self._update_zoom_buttons()
 
     def _preview_zoom_out(self, target="center"):
@@ -599,7 +673,7 @@ class GridMaker(ctk.CTk):
 
         self._preview_scale = max(cur / 1.25, self._preview_scale_min)
         self._preview_zoom_target = target
-        self._render_preview_image()
+        self._show_preview_image()
         self._update_zoom_buttons()
 
     def _mousewheel_zoom(self, event):
@@ -621,10 +695,7 @@ class GridMaker(ctk.CTk):
             cy = getattr(event, "y", 0)
 
         # store bbox and absolute canvas coordinate of that point BEFORE changing scale
-        try:
-            before_bbox = canvas.bbox("all")
-        except Exception:
-            before_bbox = None
+        before_bbox = self._preview_content_bbox() if self._preview_display_size else None
 
         # absolute coords in canvas space (works even when scrolled)
         try:
@@ -653,7 +724,7 @@ class GridMaker(ctk.CTk):
             new_scale = max(cur / 1.25, self._preview_scale_min)
 
         self._preview_scale = new_scale
-        self._render_preview_image()
+        self._show_preview_image()
         self._update_zoom_buttons()
 
     def _update_preview_nav_buttons(self):
@@ -681,30 +752,21 @@ class GridMaker(ctk.CTk):
             (exists) -> test_01.png
             (exists) -> test_02.png
         """
-        dir_name = os.path.dirname(file_path)
-        base = os.path.basename(file_path)
-        name, ext = os.path.splitext(base)
-
-        # If the file does NOT already exist → return original
-        if not os.path.exists(file_path):
-            return file_path
-
-        # Otherwise add counters
-        counter = 1
-        while True:
-            new_name = f"{name}_{counter:02d}{ext}"
-            new_path = os.path.join(dir_name, new_name)
-            if not os.path.exists(new_path):
-                return new_path
-            counter += 1
+        return unique_path(file_path)
 
     def _preview_save(self):
         """Save the currently previewed image with grid applied."""
         try:
             self.attributes("-disabled", True)
-            self._render_preview_image()
             current_file = self.preview_files[self.preview_index]
 
+            # The preview may still be rendering: make sure the current settings are saved
+            settings = shared_palette(self.preview_files, self._collect_settings())
+            if self._preview_key(current_file, settings) == self._preview_render_key:
+                render = self.last_render
+            else:
+                render, _ = render_image(current_file, settings)
+
             # ensure output folder
             output_folder = os.path.normpath(os.path.join(os.path.dirname(current_file), "output"))
             os.makedirs(output_folder, exist_ok=True)
@@ -715,8 +777,7 @@ class GridMaker(ctk.CTk):
 
             save_path = self.get_unique_path(os.path.join(output_folder, f"{name}_preview_grid{ext}"))
 
-            # self.last_render holds the last rendered PIL image (from _render_preview_image)
-            if hasattr(self, "last_render") and self.last_render is not None:
+            if render is not None:
 
                 base_name, ext = os.path.splitext(os.path.basename(save_path))
                 save_format = "PNG"
@@ -724,9 +785,9 @@ class GridMaker(ctk.CTk):
                     save_format = "JPEG"
 
                 if save_format == "JPEG":
-                    self.last_render.save(save_path, format=save_format, quality=95)
+                    render.save(save_path, format=save_format, quality=95)
                 else:
-                    self.last_render.save(save_path, format=save_format)
+                    render.save(save_path, format=save_format)
 
                 result = messagebox.askyesno(
                     "Saved", f"Image saved successfully:\n\n{save_path}\n\nOpen the folder?", parent=self.preview_window
@@ -745,9 +806,7 @@ class GridMaker(ctk.CTk):
 
     def _on_preview_mouse_move(self, event):
         try:
-            # event.x/event.y are coordinates *inside the label widget*
-            # convert to canvas coordinates by adding label widget's position on canvas
-            # we can use canvasx/canvasy from the preview_canvas if label is placed at (0,0) inside preview_frame
+            # event.x/event.y are coordinates inside the canvas widget (window coordinates)
             self._preview_mouse_x = event.x
             self._preview_mouse_y = event.y
         except:
@@ -807,6 +866,16 @@ class GridMaker(ctk.CTk):
 
         # --- Call center_window when preview window is closed ---
         def on_preview_close():
+            # Abandon any render in flight and free the cached full-resolution stages
+            self._preview_worker.cancel()
+            self._preview_request += 1
+            self._preview_stages = StageCache()
+            self.last_render = None
+            self._preview_proxy = None
+            self._preview_tiles = {}
+            self._preview_tiles_source = None
+            self._preview_display_size = None
+            self._preview_render_key = None
             if hasattr(self, "center_window"):
                 self.center_window()
                 self.update_idletasks()
@@ -816,11 +885,10 @@ class GridMaker(ctk.CTk):
 
         # --- Scan folder ---
         folder = self.folder_path_var.get()
-        supported = (".png", ".jpg", ".jpeg", ".avif", ".webp")
         self.preview_files = [
             os.path.join(folder, f)
             for f in os.listdir(folder)
-            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(supported)
+            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(SUPPORTED_FORMATS)
         ]
 
         if not self.preview_files:
@@ -846,11 +914,19 @@ class GridMaker(ctk.CTk):
         self.preview_canvas = tk.Canvas(container, background=self.cget("bg"), highlightthickness=0)
         self.preview_canvas.grid(row=0, column=0, sticky="nsew")
 
-        # Scrollbars
-        self.preview_v_scroll = tk.Scrollbar(container, orient="vertical", command=self.preview_canvas.yview)
+        # Scrollbars (scrolling brings new tiles into view)
+        def scroll_y(*args):
+            self.preview_canvas.yview(*args)
+            self._fill_preview_tiles()
+
+        def scroll_x(*args):
+            self.preview_canvas.xview(*args)
+            self._fill_preview_tiles()
+
+        self.preview_v_scroll = tk.Scrollbar(container, orient="vertical", command=scroll_y)
         self.preview_v_scroll.grid(row=0, column=1, sticky="ns")
 
-        self.preview_h_scroll = tk.Scrollbar(container, orient="horizontal", command=self.preview_canvas.xview)
+        self.preview_h_scroll = tk.Scrollbar(container, orient="horizontal", command=scroll_x)
         self.preview_h_scroll.grid(row=1, column=0, sticky="ew")
 
         # Attach scrollbars
@@ -858,26 +934,19 @@ class GridMaker(ctk.CTk):
             yscrollcommand=self.preview_v_scroll.set, xscrollcommand=self.preview_h_scroll.set
         )
 
-        # Inner CTk frame inside canvas
-        self.preview_frame = ctk.CTkFrame(self.preview_canvas, fg_color="transparent")
-        self._preview_window_id = self.preview_canvas.create_window((0, 0), window=self.preview_frame, anchor="nw")
-
-        # Update scrollregion when inner frame resizes
-        def _update_region(event=None):
-            self.preview_canvas.configure(scrollregion=self.preview_canvas.bbox("all"))
-
-        self.preview_frame.bind("<Configure>", _update_region)
+        # The image is drawn straight onto the canvas in tiles; fill in newly exposed ones on resize
+        self.preview_canvas.bind("<Configure>", lambda e: self._fill_preview_tiles())
 
-        # Image label inside preview_frame
-        self.preview_image_label = ctk.CTkLabel(self.preview_frame, text="")
-        self.preview_image_label.grid(row=0, column=0, pady=5)
+        # Status line under the image (marks the approximate proxy)
+        self.preview_status_label = ctk.CTkLabel(container, text="")
+        self.preview_status_label.grid(row=2, column=0, sticky="w")
 
         # =============================================================
         #   DRAG & DROP PANNING (SMART LOCK)
         # =============================================================
 
         def start_pan(event):
-            self.preview_image_label.configure(cursor="fleur")
+            self.preview_canvas.configure(cursor="fleur")
 
             # store starting mouse position
             self._pan_start_x = event.x_root
@@ -887,9 +956,9 @@ class GridMaker(ctk.CTk):
 
         def move_pan(event):
             # Compute content and view sizes
-            bbox = self.preview_canvas.bbox("all")
-            if not bbox:
+            if not self._preview_display_size:
                 return
+            bbox = self._preview_content_bbox()
 
             content_width = bbox[2] - bbox[0]
             content_height = bbox[3] - bbox[1]
@@ -909,27 +978,28 @@ class GridMaker(ctk.CTk):
             else:
                 target_y = self._pan_start_y
 
-            # Perform the drag
+            # Perform the drag, then draw the tiles it brought into view
             self.preview_canvas.scan_dragto(target_x, target_y, gain=1)
+            self._fill_preview_tiles()
 
         def stop_pan(event):
-            self.preview_image_label.configure(cursor="hand2")
+            self.preview_canvas.configure(cursor="hand2")
 
         # --- Bindings ---
-        self.preview_image_label.bind("<Enter>", lambda e: self.preview_image_label.configure(cursor="hand2"))
-        self.preview_image_label.bind("<Leave>", lambda e: self.preview_image_label.configure(cursor=""))
+        self.preview_canvas.bind("<Enter>", lambda e: self.preview_canvas.configure(cursor="hand2"))
+        self.preview_canvas.bind("<Leave>", lambda e: self.preview_canvas.configure(cursor=""))
 
-        self.preview_image_label.bind("<ButtonPress-1>", start_pan)
-        self.preview_image_label.bind("<B1-Motion>", move_pan)
-        self.preview_image_label.bind("<ButtonRelease-1>", stop_pan)
+        self.preview_canvas.bind("<ButtonPress-1>", start_pan)
+        self.preview_canvas.bind("<B1-Motion>", move_pan)
+        self.preview_canvas.bind("<ButtonRelease-1>", stop_pan)
 
         # Mouse wheel zoom
-        # store mouse pos relative to the *canvas* (not label) so we can compute canvasx/canvasy
+        # store mouse pos relative to the canvas so we can compute canvasx/canvasy
         self.preview_canvas.bind("<Motion>", lambda e: self._on_preview_mouse_move(e))
         # mouse wheel bindings (windows/mac/linux)
-        self.preview_image_label.bind("<MouseWheel>", self._mousewheel_zoom)
-        self.preview_image_label.bind("<Button-4>", lambda e: self._mousewheel_zoom(e))  # linux up
-        self.preview_image_label.bind("<Button-5>", lambda e: self._mousewheel_zoom(e))  # linux down
+        self.preview_canvas.bind("<MouseWheel>", self._mousewheel_zoom)
+        self.preview_canvas.bind("<Button-4>", lambda e: self._mousewheel_zoom(e))  # linux up
+        self.preview_canvas.bind("<Button-5>", lambda e: self._mousewheel_zoom(e))  # linux down
 
         # =============================================================
         #   BUTTON ROW (GRID, BIG FONT, BOLD)
@@ -992,7 +1062,7 @@ class GridMaker(ctk.CTk):
         self.next_btn.grid(row=0, column=5, padx=10, pady=10)
 
         # --- First render ---
-        top.after(250, self._render_preview_image)
+        top.after(250, lambda: self._render_preview_image(progressive=True))
         self._update_preview_nav_buttons()
 
         # --- Start periodic file check (Polling) ---
@@ -1025,22 +1095,12 @@ class GridMaker(ctk.CTk):
         except:
             pass
 
-    def _update_grid_controls(self, small_w, small_h):
-        """Calculates and updates grid cell count based on pixel art dimensions and updates UI controls."""
+    def _update_grid_controls(self, new_grid_count):
+        """Updates the grid cell count UI controls with the count synced to the pixel art dimensions."""
         if not self.settings["sync_grid_to_pixels"].get():
             # Only run if sync is enabled
             return
 
-        # Calculate grid count:
-        # Since the grid must be square (rows=cols), we select the max of the small dimensions
-        # to ensure the grid covers the entire pixelated area without creating non-square cells.
-        new_grid_count = max(small_w, small_h)
-
-        # Clamp the result
-        MIN_CELLS = 0
-        MAX_CELLS = 400
-        new_grid_count = max(MIN_CELLS, min(MAX_CELLS, int(new_grid_count)))
-
         # Update setting, slider, and label
         current_value = self.settings["grid_rows"].get()
         if current_value != new_grid_count:
@@ -1053,6 +1113,29 @@ class GridMaker(ctk.CTk):
             lbl = getattr(self, "grid_rows_label")
             lbl.configure(text=fmt.format(new_grid_count))
 
+    def _on_palette_select(self, value):
+        """Handles the palette menu; "Custom..." asks for a list of hex colors (a fixed palette)."""
+        if value == CUSTOM_PALETTE_OPTION:
+            dialog = ctk.CTkInputDialog(
+                text="Hex colors, separated by commas (e.g. #0F380F, #306230, #8BAC0F):",
+                title="Custom Palette",
+            )
+            text = (dialog.get_input() or "").strip()
+            try:
+                if not text or parse_palette(text) is None:
+                    raise ValueError("no hex colors entered")
+            except ValueError as e:
+                if text:
+                    messagebox.showerror("Custom Palette", f"Invalid palette: {e}")
+                # Keep the previous palette
+                self.settings["pixel_art_palette"].set(self._last_palette)
+                return
+            value = text
+            self.settings["pixel_art_palette"].set(value)
+
+        self._last_palette = value
+        self._restyle_checker()
+
     def _on_pixler_toggle(self):
         """Disables/enables all pixel-related UI when toggle is switched, and handles grid sync logic."""
         enabled = self.settings["pixel_art_enabled"].get()
@@ -1071,6 +1154,21 @@ class GridMaker(ctk.CTk):
         # Sharpen Toggle
         self.pixel_sharpen_toggle.configure(state=state)
 
+        # Shared Palette Toggle
+        self.pixel_shared_toggle.configure(state=state)
+
+        # Downsample OptionMenu
+        self.pixel_downsample_option.configure(state=state)
+
+        # Quantizer OptionMenu
+        self.pixel_quantizer_option.configure(state=state)
+
+        # Color Match OptionMenu
+        self.pixel_match_option.configure(state=state)
+
+        # Upscaler OptionMenu
+        self.pixel_upscale_option.configure(state=state)
+
         # Sync to pixels toggle logic
         if enabled:
             # If Pixler is ON: If Grid is also ON, set sync toggle to ON and enable it
@@ -1180,97 +1278,6 @@ class GridMaker(ctk.CTk):
         # Restyle preview
         self._restyle_checker()
 
-    def _apply_pixel_art(self, img):
-        scale = max(1, int(self.settings["pixel_art_scale"].get()))
-        palette = str(self.settings["pixel_art_palette"].get()).lower()
-        dith = str(self.settings["pixel_art_dithering"].get()).lower()
-        sharpen = bool(self.settings["pixel_art_sharpen"].get())
-
-        orig_width, orig_height = img.size
-
-        # compute target small dimensions
-        small_w = max(1, orig_width // scale)
-        small_h = max(1, orig_height // scale)
-
-        # compute target (cropped) full-size dimensions that are exact multiples of scale
-        target_w = small_w * scale
-        target_h = small_h * scale
-
-        # if original isn't divisible by scale, crop centered to make it divisible
-        if target_w != orig_width or target_h != orig_height:
-            left = (orig_width - target_w) // 2
-            top = (orig_height - target_h) // 2
-            right = left + target_w
-            bottom = top + target_h
-            img = img.crop((left, top, right, bottom))
-
-        width, height = img.size  # now width==target_w, height==target_h
-
-        print(width // scale, height // scale)
-
-        # Update grid count based on pixel art dimensions
-        if self.settings["sync_grid_to_pixels"].get():
-            # Calculate and update the grid controls based on the pixel art dimensions
-            self._update_grid_controls(small_w, small_h)
-
-        # create small (downscaled) image in RGB for predictable behavior
-        small = img.convert("RGB").resize((small_w, small_h), Image.NEAREST)
-
-        target_colors = 256
-        if palette != "none":
-            if palette == "game boy":
-                target_colors = 4
-            else:
-                try:
-                    target_colors = int(palette)
-                except Exception:
-                    target_colors = 16
-
-        # Step 1: Generate the Palette Image (Base)
-        if palette != "none":
-            base_palette_img = small.quantize(
-                colors=target_colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE
-            )
-        else:
-            base_palette_img = None
-
-        # Step 2: Apply Dithering based on mode
-        if dith == "ordered":
-            # Create the pattern using Web Palette
-            temp_ordered = small.convert("P", dither=Image.ORDERED)
-
-            if base_palette_img:
-                # FIX: Convert 'P' back to 'RGB' before re-quantizing to the custom palette
-                temp_rgb = temp_ordered.convert("RGB")
-                # Map the patterned pixels to the custom palette (dither=0 to preserve the pattern)
-                small_p = temp_rgb.quantize(palette=base_palette_img, dither=Image.Dither.NONE)
-            else:
-                small_p = temp_ordered
-
-        elif dith == "floyd":
-            if base_palette_img:
-                small_p = small.quantize(palette=base_palette_img, dither=Image.Dither.FLOYDSTEINBERG)
-            else:
-                small_p = small.convert("P", dither=Image.Dither.FLOYDSTEINBERG, palette=Image.Palette.ADAPTIVE)
-
-        else:
-            # No Dithering
-            if base_palette_img:
-                small_p = base_palette_img
-            else:
-                small_p = small
-
-        # ---------- Upscale ----------
-        result = small_p.resize((width, height), Image.NEAREST)
-
-        if result.mode != "RGB":
-            result = result.convert("RGB")
-
-        if sharpen:
-            result = result.filter(ImageFilter.SHARPEN)
-
-        return result
-
     # --- UI Creation and Layout Methods ---
     def _create_widgets(self):
         """Creates all UI widgets and initializes their grid layout."""
@@ -1424,13 +1431,46 @@ class GridMaker(ctk.CTk):
         slider_and_value_frame = self.pixel_scale_slider.master
         slider_and_value_frame.grid_configure(row=0, column=1, sticky="ew", padx=(0, 0), pady=(0, 0))
 
+        # Downsample mode (how each cell's color is picked)
+        ctk.CTkLabel(pixel_slider_frame, text="Sampling:").grid(row=0, column=2, sticky="e", padx=(15, 5))
+        self.pixel_downsample_option = ctk.CTkOptionMenu(
+            pixel_slider_frame,
+            variable=self.settings["pixel_art_downsample"],
+            values=list(DOWNSAMPLE_MODES),
+            width=110,
+            command=lambda v: self._restyle_checker(),
+        )
+        self.pixel_downsample_option.grid(row=0, column=3, sticky="e")
+
+        # Quantizer (how adaptive 16/32/64 color palettes are solved)
+        ctk.CTkLabel(pixel_slider_frame, text="Quantizer:").grid(row=0, column=4, sticky="e", padx=(15, 5))
+        self.pixel_quantizer_option = ctk.CTkOptionMenu(
+            pixel_slider_frame,
+            variable=self.settings["pixel_art_quantizer"],
+            values=list(available_quantizers()),
+            width=120,
+            command=lambda v: self._restyle_checker(),
+        )
+        self.pixel_quantizer_option.grid(row=0, column=5, sticky="e")
+
+        # Color match (distance used to map onto fixed palettes; Lab = perceptual)
+        ctk.CTkLabel(pixel_slider_frame, text="Match:").grid(row=0, column=6, sticky="e", padx=(15, 5))
+        self.pixel_match_option = ctk.CTkOptionMenu(
+            pixel_slider_frame,
+            variable=self.settings["pixel_art_color_match"],
+            values=list(COLOR_METRICS),
+            width=70,
+            command=lambda v: self._restyle_checker(),
+        )
+        self.pixel_match_option.grid(row=0, column=7, sticky="e")
+
         # ------------------------------
         # Row 10: Palette + Dithering + Sharpen Toggle
         # ------------------------------
         row10_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
         row10_frame.grid(row=10, column=0, columnspan=2, sticky="ew", padx=20, pady=(10, 10))
 
-        # Configure columns: 0=Palette, 1=Dithering, 2=spacer, 3=Sharpen
+        # Configure columns: 0=Palette, 1=Dithering, 2=Sharpen, 3=Shared palette, 4=Upscaler
         row10_frame.grid_columnconfigure(0, weight=1)
         row10_frame.grid_columnconfigure(1, weight=1)
         row10_frame.grid_columnconfigure(2, weight=1)
@@ -1440,17 +1480,18 @@ class GridMaker(ctk.CTk):
         self.pixel_palette_option = ctk.CTkOptionMenu(
             row10_frame,
             variable=self.settings["pixel_art_palette"],
-            values=["None", "16", "32", "64", "Game Boy"],
-            command=lambda v: self._restyle_checker(),
+            values=["None", "16", "32", "64", "Game Boy", CUSTOM_PALETTE_OPTION],
+            command=self._on_palette_select,
         )
         self.pixel_palette_option.grid(row=0, column=0, sticky="e", padx=(50, 15))  # Adjust spacing as needed
+        self._last_palette = self.settings["pixel_art_palette"].get()
 
         # Dithering
         ctk.CTkLabel(row10_frame, text="Dithering:").grid(row=0, column=1, sticky="w", padx=(0, 10))
         self.pixel_dither_option = ctk.CTkOptionMenu(
             row10_frame,
             variable=self.settings["pixel_art_dithering"],
-            values=["None", "Floyd", "Ordered"],
+            values=["None", "Floyd", "Atkinson", "Sierra Lite", "Stucki", "Ordered", "Bayer 2x2", "Bayer 4x4", "Blue Noise"],
             command=lambda v: self._restyle_checker(),
         )
         self.pixel_dither_option.grid(row=0, column=1, sticky="e", padx=(60, 10))  # Adjust spacing
@@ -1471,6 +1512,36 @@ class GridMaker(ctk.CTk):
         )
         self.pixel_sharpen_toggle.grid(row=0, column=1)
 
+        # Shared Palette Toggle (one adaptive palette for the whole folder)
+        shared_frame = ctk.CTkFrame(row10_frame, fg_color="transparent")
+        shared_frame.grid(row=0, column=3, sticky="e", padx=(10, 8))
+
+        ctk.CTkLabel(shared_frame, text="Shared", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=(0, 10))
+
+        self.pixel_shared_toggle = ctk.CTkSwitch(
+            shared_frame,
+            text="",
+            variable=self.settings["pixel_art_shared_palette"],
+            onvalue=True,
+            offvalue=False,
+            command=self._restyle_checker,
+        )
+        self.pixel_shared_toggle.grid(row=0, column=1)
+
+        # Upscaler (nearest-neighbor blocks or edge-smoothing ScaleNx)
+        upscale_frame = ctk.CTkFrame(row10_frame, fg_color="transparent")
+        upscale_frame.grid(row=0, column=4, sticky="e", padx=(10, 0))
+
+        ctk.CTkLabel(upscale_frame, text="Upscale:").grid(row=0, column=0, padx=(0, 5))
+        self.pixel_upscale_option = ctk.CTkOptionMenu(
+            upscale_frame,
+            variable=self.settings["pixel_art_upscaler"],
+            values=list(UPSCALE_MODES),
+            width=100,
+            command=lambda v: self._restyle_checker(),
+        )
+        self.pixel_upscale_option.grid(row=0, column=1)
+
         # ------------------------------
         # Row 11 : Grid Toggle
         # ------------------------------
@@ -1780,6 +1851,33 @@ class GridMaker(ctk.CTk):
             row=19, column=0, columnspan=2, pady=(10, 0), sticky="w", padx=20
         )
 
+        # Batch worker pool (right of the Progress label): worker count and backend
+        batch_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        batch_frame.grid(row=19, column=0, columnspan=2, sticky="e", padx=20, pady=(10, 0))
+
+        ctk.CTkLabel(batch_frame, text="Workers:").grid(row=0, column=0, sticky="e", padx=(0, 5))
+        self.batch_workers_choice = ctk.StringVar()
+        self.batch_workers_option = ctk.CTkOptionMenu(
+            batch_frame,
+            variable=self.batch_workers_choice,
+            values=["Auto"] + [str(n) for n in range(1, (os.cpu_count() or 1) + 1)],
+            width=80,
+            command=self._on_batch_workers_choice,
+        )
+        self.batch_workers_option.grid(row=0, column=1, sticky="e")
+        # Follow the setting when it changes elsewhere (config load, reset)
+        self.settings["batch_workers"].trace_add("write", lambda *_: self._show_batch_workers())
+        self._show_batch_workers()
+
+        ctk.CTkLabel(batch_frame, text="Backend:").grid(row=0, column=2, sticky="e", padx=(15, 5))
+        self.batch_backend_option = ctk.CTkOptionMenu(
+            batch_frame,
+            variable=self.settings["batch_backend"],
+            values=list(BACKENDS),
+            width=90,
+        )
+        self.batch_backend_option.grid(row=0, column=3, sticky="e")
+
         # New Frame for Progress Bar and Percentage Label
         progress_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
         progress_frame.grid(row=20, column=0, columnspan=2, pady=(0, 10), sticky="ew", padx=20)
@@ -1858,6 +1956,17 @@ class GridMaker(ctk.CTk):
         )
         self.reset_button.grid(row=0, column=2, sticky="ew", padx=(10, 0))
 
+    def _show_batch_workers(self):
+        """Shows the batch_workers setting in the Workers menu (0 or less = Auto, one per CPU core)."""
+        try:
+            workers = int(self.settings["batch_workers"].get())
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_WORKERS
+        self.batch_workers_choice.set(str(workers) if workers > 0 else "Auto")
+
+    def _on_batch_workers_choice(self, value):
+        self.settings["batch_workers"].set(0 if value == "Auto" else int(value))
+
     # --- Bind mouse release to call _restyle_checker ---
     def on_release(self, event):
         self._restyle_checker()
@@ -1927,13 +2036,12 @@ class GridMaker(ctk.CTk):
             return
 
         folder = self.folder_path_var.get()
-        supported = (".png", ".jpg", ".jpeg", ".avif", ".webp")
 
         # 1. Generate the list of current files in the folder
         new_preview_files = [
             os.path.join(folder, f)
             for f in os.listdir(folder)
-            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(supported)
+            if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(SUPPORTED_FORMATS)
         ]
 
         # 2. Get the currently displayed file
@@ -2020,11 +2128,10 @@ class GridMaker(ctk.CTk):
         if hasattr(self, "preview_window") and self.preview_window.winfo_exists():
             # Re-scan the new folder
             folder = self.folder_path_var.get()
-            supported = (".png", ".jpg", ".jpeg", ".avif", ".webp")
             self.preview_files = [
                 os.path.join(folder, f)
                 for f in os.listdir(folder)
-                if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(supported)
+                if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(SUPPORTED_FORMATS)
             ]
 
             if not self.preview_files:
@@ -2178,8 +2285,15 @@ class GridMaker(ctk.CTk):
             self.save_config()
             self.stop_requested = False
 
+            # Snapshot everything the batch needs here, on the Tk thread
+            settings = self._collect_settings()
+            workers = self.settings["batch_workers"].get()
+            backend = self.settings["batch_backend"].get()
+
             # Start process in a new thread
-            self.processing_thread = threading.Thread(target=self.start_process, daemon=True)
+            self.processing_thread = threading.Thread(
+                target=self.start_process, args=(folder_path, settings, workers, backend), daemon=True
+            )
             self.processing_thread.start()
 
     def _set_ui_state(self, state="normal"):
@@ -2201,17 +2315,25 @@ class GridMaker(ctk.CTk):
         self.zoom_slider.configure(state=state)
         self.rows_slider.configure(state=state)
 
-    def start_process(self):
+    def start_process(self, folder_path, settings, workers=DEFAULT_WORKERS, backend=DEFAULT_BACKEND):
         """
         Initializes and manages the grid processing operation on the selected folder.
-        Runs in a separate thread.
+        Runs in a separate thread; all UI updates are scheduled on the Tk thread with after().
+
+        :param folder_path: Input folder.
+        :param settings: RenderSettings snapshot taken when the process was started.
+        :param workers: Worker count (0 = one per CPU core).
+        :param backend: Worker pool backend ("thread" or "process").
         """
         self.is_running = True
-        self.progress_bar.set(0)
-        self.progress_text_var.set("0%")  # Reset text at start
 
-        if hasattr(self, "preview_window") and self.preview_window.winfo_exists():
-            self.preview_window.attributes("-disabled", True)
+        def reset_ui():
+            self.progress_bar.set(0)
+            self.progress_text_var.set("0%")  # Reset text at start
+            if hasattr(self, "preview_window") and self.preview_window.winfo_exists():
+                self.preview_window.attributes("-disabled", True)
+
+        self.after(0, reset_ui)
 
         # Configure button for STOP state with new style parameters
         self.after(
@@ -2227,20 +2349,13 @@ class GridMaker(ctk.CTk):
 
         self.after(0, lambda: self._set_ui_state("disabled"))
 
-        folder_path = self.folder_path_var.get()
         output_dir = os.path.normpath(os.path.join(folder_path, "output"))
         os.makedirs(output_dir, exist_ok=True)
 
-        # Supported image formats
-        supported_formats = (".png", ".jpg", ".jpeg", ".avif", ".webp")
+        # Assign every supported image its output name up front
+        jobs = plan_batch(folder_path, output_dir)
 
-        files = [
-            f
-            for f in os.listdir(folder_path)
-            if os.path.isfile(os.path.join(folder_path, f)) and f.lower().endswith(supported_formats)
-        ]
-
-        self.total_files = len(files)
+        self.total_files = len(jobs)
         if self.total_files == 0:
             self.after(
                 0,
@@ -2250,67 +2365,67 @@ class GridMaker(ctk.CTk):
                 ],
             )
             self._cleanup_process(success=False)
-            self._update_preview_button_state()
+            self.after(0, self._update_preview_button_state)
             return
 
-        settings = {
-            "h_padding": self.settings["h_padding"].get(),
-            "v_padding": self.settings["v_padding"].get(),
-            "zoom_factor": self.settings["zoom_factor"].get(),
-            "grid_color": self.settings["grid_color"].get(),
-            "grid_rows": self.settings["grid_rows"].get(),
-            "grid_cols": self.settings["grid_rows"].get(),
-            "show_grid_numbers": self.settings["show_grid_numbers"].get(),
-        }
-
-        for i, filename in enumerate(files):
-            if self.stop_requested:
-                self.after(
-                    0,
-                    lambda: [
-                        messagebox.showinfo("Stopped", "Process manually stopped by user."),
-                        self._enable_preview_window(),
-                    ],
-                )
-                self._cleanup_process(success=False)
-                return
+        def on_progress(done, total):
+            # Update progress bar and percentage label on the main thread
+            progress_value = done / total
+            percentage = int(progress_value * 100)
+            self.after(0, lambda: [self.progress_bar.set(progress_value), self.progress_text_var.set(f"{percentage}%")])
 
-            input_path = os.path.join(folder_path, filename)
-
-            # --- FILENAME SANITIZATION FIX ---
-            base_name, ext = os.path.splitext(filename)
-            # Replace spaces and parentheses with underscores for file system compatibility
-            safe_base_name = base_name.replace(" ", "_").replace("(", "").replace(")", "")
-            # Ensure multiple underscores are not collapsed, as a simple replace is safer
-            output_filename = f"grid_{safe_base_name}{ext}"
-            output_path = self.get_unique_path(os.path.join(output_dir, output_filename))
-            # --- FILENAME SANITIZATION FIX END ---
+        try:
+            result = run_batch(
+                jobs,
+                settings,
+                workers=workers,
+                backend=backend,
+                progress=on_progress,
+                should_stop=lambda: self.stop_requested,
+            )
 
-            try:
-                self._process_image(input_path, output_path, settings)
+        except BatchError as e:
+            # Log the error with the problematic filename
+            print(e)
+            # keep a reference: 'e' is cleared when the except block ends, before the callback runs
+            error = e
+            self.after(
+                0,
+                lambda: [
+                    messagebox.showerror(
+                        "Processing Error",
+                        f"Error processing {error.filename}: {error.error}\n\nThis may be caused by special characters in the filename. Try renaming the file.",
+                    ),
+                    self._enable_preview_window(),
+                ],
+            )
+            self._cleanup_process(success=False)
+            return  # Exit process on critical error
 
-                # Update progress bar and percentage label on the main thread
-                progress_value = (i + 1) / self.total_files
-                percentage = int(progress_value * 100)
-                self.after(
-                    0, lambda: [self.progress_bar.set(progress_value), self.progress_text_var.set(f"{percentage}%")]
-                )
+        except Exception as e:
+            # Worker pool could not be started or broke down (e.g. a worker process crashed)
+            print(f"Batch process error: {e}")
+            error = e
+            self.after(
+                0,
+                lambda: [
+                    messagebox.showerror("Processing Error", f"Batch process failed: {error}"),
+                    self._enable_preview_window(),
+                ],
+            )
+            self._cleanup_process(success=False)
+            return
 
-            except Exception as e:
-                # Log the error with the problematic filename
-                print(f"Error processing {filename}: {e}")
-                self.after(
-                    0,
-                    lambda: [
-                        messagebox.showerror(
-                            "Processing Error",
-                            f"Error processing {filename}: {e}\n\nThis may be caused by special characters in the filename. Try renaming the file.",
-                        ),
-                        self._enable_preview_window(),
-                    ],
-                )
-                self._cleanup_process(success=False)
-                return  # Exit process on critical error
+        if result.stopped:
+            self.after(
+                0,
+                lambda: [
+                    messagebox.showinfo("Stopped", "Process manually stopped by user."),
+                    self._enable_preview_window(),
+                ],
+            )
+            self._cleanup_process(success=False)
+            return
 
         self._cleanup_process(success=True)
 
@@ -2361,167 +2476,17 @@ class GridMaker(ctk.CTk):
             self.after(0, show_success_and_option)
 
         else:
-            # Ensure progress bar remains at current state or 0 if started and immediately stopped
-            if self.progress_bar.get() < 1.0:
-                current_progress = self.progress_bar.get()
-                current_percentage = int(current_progress * 100)
-                self.after(0, lambda: self.progress_text_var.set(f"{current_percentage}%"))
-            else:
-                # If success=False but progress is 1.0 (shouldn't happen usually, but for safety)
-                self.after(0, lambda: self.progress_text_var.set("100%"))
-
-    def _apply_grid_numbers(self, img):
-        """Applies grid numbers to the image."""
-        text_color = self.settings["grid_number_text_color"].get()
-        bg_color = self.settings["grid_number_bg_color"].get()
-
-        img = img.convert("RGB")
-        width, height = img.size
-
-        rows_setting = self.settings["grid_rows"].get()
-
-        if height >= width:
-            rows = rows_setting
-            cols = round(rows * (width / height))
-        else:
-            cols = rows_setting
-            rows = round(cols * (height / width))
 
-        try:
-            font_size = max(14, min(width, height) // 40)
-            font = ImageFont.truetype("arial.ttf", font_size)
-            bold_font = ImageFont.truetype("arialbd.ttf", font_size)
-        except:
-            font = None
-            bold_font = None
-            font_size = 14
-
-        base_margin = int(max(min(width, height) * 0.07, font_size * 2.5))
-        margin_left = base_margin
-        margin_top = base_margin
-
-        new_width = width + margin_left
-        new_height = height + margin_top
-
-        new_img = Image.new("RGB", (new_width, new_height), bg_color)
-
-        new_img.paste(img, (margin_left, margin_top))
-        draw = ImageDraw.Draw(new_img)
-
-        row_step = height / rows
-        col_step = width / cols
-
-        def text_size(draw_obj, text, font_obj):
-            bbox = draw_obj.textbbox((0, 0), text, font=font_obj)
-            return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-        # Row numbers every 10 rows
-        for i in range(rows + 1):
-            if i % 10 != 0:
-                continue  # skip all non-10-step rows
-
-            num = i // 10  # numbering logic
-
-            y = round(i * row_step) + margin_top
-            text = str(num)
-
-            is_bold = (num == 0) or (num % 5 == 0)
-            f = bold_font if is_bold else font
-
-            w, h = text_size(draw, text, f)
-            draw.text(
-                (margin_left - w - max(5, font_size // 2), y - h),
-                text,
-                fill=text_color,
-                font=f,
-            )
-
-        # Column numbers every 10 columns
-        for i in range(cols + 1):
-            if i % 10 != 0:
-                continue  # skip all non-10-step columns
-
-            num = i // 10
-
-            x = round(i * col_step) + margin_left
-            text = str(num)
-
-            is_bold = (num == 0) or (num % 5 == 0)
-            f = bold_font if is_bold else font
-
-            w, h = text_size(draw, text, f)
-            draw.text(
-                (x - w // 2, margin_top - h - max(5, font_size // 2) - 5),
-                text,
-                fill=text_color,
-                font=f,
-            )
-
-        return new_img
-
-    def _process_image(self, input_path, output_path, settings):
-        """
-        Applies padding removal, resizing, and grid overlay to a single image.
+            def keep_progress():
+                # Ensure progress bar remains at current state or 0 if started and immediately stopped
+                if self.progress_bar.get() < 1.0:
+                    current_percentage = int(self.progress_bar.get() * 100)
+                    self.progress_text_var.set(f"{current_percentage}%")
+                else:
+                    # If success=False but progress is 1.0 (shouldn't happen usually, but for safety)
+                    self.progress_text_var.set("100%")
 
-        :param input_path: Full path to the input image file.
-        :param output_path: Full path to save the processed image.
-        :param settings: Dictionary containing all grid processing parameters.
-        """
-        img = Image.open(input_path).convert("RGB")
-        width, height = img.size
-
-        # 1. Padding Removal (Trim)
-        h_pad = settings["h_padding"]  # Left/Right trim amount
-        v_pad = settings["v_padding"]  # Top/Bottom trim amount
-
-        # Calculate the new crop box
-        # left = h_pad, top = v_pad, right = width - h_pad, bottom = height - v_pad
-        if width > 2 * h_pad and height > 2 * v_pad:
-            img = img.crop((h_pad, v_pad, width - h_pad, height - v_pad))
-        # Recalculate size after crop
-        width, height = img.size
-
-        # 2. Resize (Zoom)
-        zoom = settings["zoom_factor"]
-        new_width = int(width * zoom)
-        new_height = int(height * zoom)
-
-        if new_width > 0 and new_height > 0:
-            # Use BICUBIC for good quality resizing
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)  # Changed to LANCZOS for better quality
-        # Recalculate size after resize
-        width, height = img.size
-
-        # Grid settings
-        grid_color = settings["grid_color"]
-        rows = settings["grid_rows"]
-        cols = rows  # enforce square grid
-
-        # Apply Pixel Art
-        if self.settings["pixel_art_enabled"].get():
-            img = self._apply_pixel_art(img)
-            rows = self.settings["grid_rows"].get()
-            cols = rows
-
-        # --- Skip if grid disabled ---
-        if self.settings.get("grid_enabled").get() and rows > 0:
-            # 3. Draw grid
-            img = self._draw_grid(img, rows, cols, grid_color)
-            # --- Apply grid numbers if enabled
-            if self.settings["show_grid_numbers"].get():
-                img = self._apply_grid_numbers(img)
-
-        # 4. Save Output
-        base_name, ext = os.path.splitext(os.path.basename(output_path))
-        save_format = "PNG"
-        if ext.lower() in (".jpg", ".jpeg"):
-            save_format = "JPEG"
-
-        # Use quality setting for JPEG to ensure good output size/quality balance
-        if save_format == "JPEG":
-            img.save(output_path, format=save_format, quality=95)
-        else:
-            img.save(output_path, format=save_format)
+            self.after(0, keep_progress)
 
     # --- Utility Methods ---
 
@@ -2677,9 +2642,13 @@ class GridMaker(ctk.CTk):
                 print(f"Could not remove lock file: {e}")
         # --- Single Instance Cleanup END ---
 
+        self._preview_worker.stop()
         self.destroy()
 
 
 if __name__ == "__main__":
+    # Required for the process batch backend in frozen (Nuitka) builds
+    multiprocessing.freeze_support()
+    acquire_instance_lock()
     app = GridMaker()
     app.mainloop()
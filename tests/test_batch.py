@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from gridmaker import batch
+
+from gridmaker.batch import BatchError, plan_batch, run_batch, shared_palette
+from gridmaker.settings import RenderSettings
+
+
+def _shared_palette_folder(tmp_path, monkeypatch):
+    """A batch folder holding one gradient image and one corrupt file, with a private cache."""
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path / "cache"))
+    folder = tmp_path / "in"
+    folder.mkdir()
+    img = Image.linear_gradient("L").resize((96, 64)).convert("RGB")
+    img.save(folder / "a.png")
+    (folder / "b.png").write_bytes(b"not an image")
+    settings = RenderSettings().replace(pixel_art_enabled=True, pixel_art_palette="16", pixel_art_shared_palette=True)
+    return folder, settings
+
+
+def test_shared_palette_skips_corrupt_sample(tmp_path, monkeypatch):
+    folder, settings = _shared_palette_folder(tmp_path, monkeypatch)
+    paths = [str(folder / "a.png"), str(folder / "b.png")]
+
+    resolved = shared_palette(paths, settings)
+
+    assert resolved.pixel_art_palette.startswith("#")
+
+
+def test_run_batch_reports_corrupt_file(tmp_path, monkeypatch):
+    folder, settings = _shared_palette_folder(tmp_path, monkeypatch)
+    jobs = plan_batch(str(folder), str(tmp_path / "out"))
+    os.makedirs(tmp_path / "out")
+
+    try:
+        run_batch(jobs, settings, workers=1)
+    except BatchError as e:
+        assert e.filename == "b.png"
+    else:
+        raise AssertionError("run_batch did not raise BatchError")
+    assert os.path.exists(jobs[0].output_path)
+
+
+class _BrokenExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+
+def test_run_batch_wraps_a_broken_pool(tmp_path, monkeypatch):
+    folder, settings = _shared_palette_folder(tmp_path, monkeypatch)
+    jobs = plan_batch(str(folder), str(tmp_path / "out"))
+    monkeypatch.setattr(batch, "_make_executor", lambda backend, workers: _BrokenExecutor(workers))
+
+    try:
+        run_batch(jobs, settings.replace(pixel_art_shared_palette=False), workers=1, backend="process")
+    except BatchError as e:
+        assert e.filename == "a.png"
+        assert isinstance(e.error, BrokenProcessPool)
+    else:
+        raise AssertionError("run_batch did not raise BatchError")
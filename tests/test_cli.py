@@ -0,0 +1,15 @@
+import json
+
+from PIL import Image
+
+from gridmaker.cli import main
+
+
+def test_unknown_config_backend_is_an_error(tmp_path, capsys):
+    (tmp_path / "in").mkdir()
+    Image.new("RGB", (32, 32)).save(tmp_path / "in" / "a.png")
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"batch_backend": "bogus"}))
+
+    assert main(["render", str(tmp_path / "in"), str(tmp_path / "out"), "--config", str(config)]) == 2
+    assert "batch_backend" in capsys.readouterr().err
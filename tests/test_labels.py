@@ -0,0 +1,21 @@
+from PIL import Image, ImageChops
+
+from gridmaker.labels import number_canvas, number_layout
+
+
+def test_number_canvas_places_the_image_inside_filled_margins():
+    img = Image.linear_gradient("L").resize((120, 90)).convert("RGB")
+    layout = number_layout(*img.size)
+    indexed = img.convert("P", palette=Image.Palette.ADAPTIVE, colors=16)
+    bg = tuple(indexed.getpalette()[:3])
+
+    for source, color in ((img, (255, 255, 255)), (indexed, bg)):
+        canvas = number_canvas(source, layout, "#%02X%02X%02X" % color)
+
+        assert canvas.mode == source.mode
+        assert canvas.size == (img.width + layout.margin, img.height + layout.margin)
+        inner = canvas.crop((layout.margin, layout.margin) + canvas.size)
+        assert ImageChops.difference(inner.convert("RGB"), source.convert("RGB")).getbbox() is None
+        rgb = canvas.convert("RGB")
+        for box in ((0, 0, canvas.width, layout.margin), (0, 0, layout.margin, canvas.height)):
+            assert rgb.crop(box).getcolors() == [((box[2] - box[0]) * (box[3] - box[1]), color)]
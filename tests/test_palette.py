@@ -0,0 +1,79 @@
+import numpy as np
+from PIL import Image
+
+from gridmaker.palette import map_to_palette, nearest_colors, parse_palette, rgb_to_lab
+from gridmaker.pipeline import render_image
+from gridmaker.settings import RenderSettings
+
+
+def test_rgb_to_lab_reference_colors():
+    lab = rgb_to_lab([[255, 255, 255], [0, 0, 0], [255, 0, 0]])
+
+    np.testing.assert_allclose(lab[0], (100, 0, 0), atol=0.05)
+    np.testing.assert_allclose(lab[1], (0, 0, 0), atol=0.05)
+    np.testing.assert_allclose(lab[2], (53.24, 80.09, 67.20), atol=0.05)
+
+
+def test_palette_colors_map_to_themselves(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    colors = parse_palette("#000000, #FFFFFF, #E03C28, #2050C0, #30A040")
+    img = Image.new("RGB", (len(colors), 1))
+    img.putdata(colors)
+
+    for metric in ("rgb", "lab"):
+        mapped = map_to_palette(img, colors, metric).convert("RGB")
+        assert list(mapped.getdata()) == list(colors)
+
+
+def test_lab_match_is_perceptual(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    # A dark blue is nearer black in RGB distance but nearer the saturated blue in CIELAB
+    colors = parse_palette("#000000, #0000FF")
+    img = Image.new("RGB", (1, 1), (0, 0, 120))
+
+    assert map_to_palette(img, colors, "rgb").convert("RGB").getpixel((0, 0)) == (0, 0, 0)
+    assert map_to_palette(img, colors, "lab").convert("RGB").getpixel((0, 0)) == (0, 0, 255)
+
+
+def _large_palette(count):
+    rng = np.random.default_rng(0)
+    return ", ".join("#%02X%02X%02X" % tuple(color) for color in rng.integers(0, 256, (count, 3)))
+
+
+def test_map_to_large_palette_is_rgb(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    colors = parse_palette(_large_palette(500))
+    img = Image.linear_gradient("L").resize((64, 48)).convert("RGB")
+
+    mapped = map_to_palette(img, colors, "lab")
+
+    assert len(colors) == 500
+    assert mapped.mode == "RGB"
+    assert {color for _count, color in mapped.getcolors(4096)} <= set(colors)
+
+
+def test_large_palette_matches_brute_force(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    colors = parse_palette(_large_palette(600))
+    pixels = np.random.default_rng(1).integers(0, 256, (5000, 3)).astype(np.uint8)
+
+    for metric in ("rgb", "lab"):
+        palette = np.asarray(colors, dtype=np.float32)
+        points = pixels.astype(np.float32)
+        if metric == "lab":
+            palette, points = rgb_to_lab(palette), rgb_to_lab(pixels)
+        nearest = ((points[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+
+        matched = palette[nearest_colors(pixels, colors, metric)]
+
+        np.testing.assert_allclose(((points - matched) ** 2).sum(axis=1), nearest, rtol=1e-5, atol=1e-3)
+
+def test_render_with_500_colors(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    palette = _large_palette(500)
+    img = Image.linear_gradient("L").resize((96, 64)).convert("RGB")
+
+    for dithering in ("None", "Floyd", "Ordered", "Atkinson"):
+        settings = RenderSettings().replace(pixel_art_palette=palette, pixel_art_dithering=dithering)
+        result, _rows = render_image(img, settings, indexed=True)
+        assert result.mode == "RGB"
@@ -0,0 +1,80 @@
+from PIL import Image, ImageChops
+
+from gridmaker.pipeline import process_image, render_image
+from gridmaker.plan import compile_plan
+from gridmaker.settings import RenderSettings
+
+
+def _source(tmp_path):
+    path = tmp_path / "in.png"
+    Image.linear_gradient("L").resize((120, 90)).convert("RGB").save(path)
+    return str(path)
+
+
+def test_unreduced_pixel_art_is_not_indexed():
+    settings = RenderSettings().replace(pixel_art_palette="None", pixel_art_dithering="None")
+
+    assert compile_plan(settings, (400, 300), "RGB", True).steps[0].extra_colors is None
+    assert "P" not in compile_plan(settings, (400, 300), "RGB", True).explain().splitlines()[0]
+
+
+def test_reduced_pixel_art_is_indexed():
+    for palette, dithering in (("16", "None"), ("Game Boy", "None"), ("None", "Ordered")):
+        settings = RenderSettings().replace(pixel_art_palette=palette, pixel_art_dithering=dithering)
+        assert compile_plan(settings, (400, 300), "RGB", True).steps[0].extra_colors is not None
+
+
+def test_indexed_render_matches_rgb_render(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = _source(tmp_path)
+    # Anti-aliased numbers are drawn in a few coverage levels, so only compare the grid
+    settings = RenderSettings().replace(pixel_art_palette="Game Boy", grid_enabled=True, show_grid_numbers=False)
+
+    indexed, _rows = render_image(path, settings, indexed=True)
+    rgb, _rows = render_image(path, settings)
+
+    assert indexed.mode == "P"
+    assert ImageChops.difference(indexed.convert("RGB"), rgb).getbbox() is None
+
+
+def test_small_palette_is_saved_compact(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = _source(tmp_path)
+    settings = RenderSettings().replace(pixel_art_palette="Game Boy", grid_enabled=False, show_grid_numbers=False)
+
+    process_image(path, str(tmp_path / "out.png"), settings)
+
+    with Image.open(tmp_path / "out.png") as saved:
+        assert saved.mode == "P"
+        assert len(saved.getpalette()) // 3 <= 4
+
+
+def _png_bit_depth(path):
+    with open(path, "rb") as f:
+        return f.read(25)[24]
+
+
+def test_palette_holds_only_the_drawn_colors(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = _source(tmp_path)
+    settings = RenderSettings().replace(pixel_art_palette="Game Boy", grid_enabled=True, show_grid_numbers=False)
+
+    process_image(path, str(tmp_path / "grid.png"), settings)
+    process_image(path, str(tmp_path / "numbers.png"), settings.replace(show_grid_numbers=True))
+
+    with Image.open(tmp_path / "grid.png") as saved:
+        assert len(saved.getpalette()) // 3 == 5
+    assert _png_bit_depth(tmp_path / "grid.png") == 4
+    with Image.open(tmp_path / "numbers.png") as saved:
+        assert len(saved.getpalette()) // 3 <= 4 + 1 + 1 + 4
+
+
+def test_only_rgb_and_grayscale_sources_are_decoded_reduced():
+    settings = RenderSettings().replace(zoom_factor=0.2, pixel_art_enabled=False, grid_enabled=False)
+
+    for mode in ("RGB", "L"):
+        assert compile_plan(settings, (4000, 3000), mode).max_reduce > 1
+    for mode in ("RGBA", "P"):
+        plan = compile_plan(settings, (4000, 3000), mode)
+        assert plan.max_reduce == 1
+        assert "decode at up to" not in plan.explain()
@@ -0,0 +1,72 @@
+from PIL import Image, ImageChops
+
+from gridmaker import plan
+from gridmaker.pipeline import render_image
+from gridmaker.preview import StageCache
+from gridmaker.settings import RenderSettings
+
+
+def _count_calls(monkeypatch, cls, name):
+    calls = []
+    original = getattr(cls, name)
+
+    def counted(self, img):
+        calls.append(name)
+        return original(self, img)
+
+    monkeypatch.setattr(cls, name, counted)
+    return calls
+
+
+def test_restyling_the_grid_reuses_the_pixel_art(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = tmp_path / "in.png"
+    Image.linear_gradient("L").resize((120, 90)).convert("RGB").save(path)
+    settings = RenderSettings().replace(pixel_art_palette="16", grid_enabled=True, show_grid_numbers=True)
+    cache = StageCache()
+    cache.render(str(path), settings)
+    sampled = _count_calls(monkeypatch, plan.PixelArt, "sample")
+    reduced = _count_calls(monkeypatch, plan.PixelArt, "reduce")
+
+    restyled = settings.replace(grid_color="#FF0000")
+    img, rows = cache.render(str(path), restyled)
+
+    assert sampled == [] and reduced == []
+    expected, expected_rows = render_image(str(path), restyled)
+    assert rows == expected_rows
+    assert ImageChops.difference(img, expected).getbbox() is None
+
+
+def test_new_palette_reuses_the_sampled_cells(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = tmp_path / "in.png"
+    Image.linear_gradient("L").resize((120, 90)).convert("RGB").save(path)
+    settings = RenderSettings().replace(pixel_art_palette="16")
+    cache = StageCache()
+    cache.render(str(path), settings)
+    sampled = _count_calls(monkeypatch, plan.PixelArt, "sample")
+    reduced = _count_calls(monkeypatch, plan.PixelArt, "reduce")
+
+    cache.render(str(path), settings.replace(pixel_art_palette="Game Boy"))
+
+    assert sampled == [] and reduced == ["reduce"]
+
+
+def test_restyling_reuses_the_number_canvas(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRIDMAKER_CACHE_DIR", str(tmp_path))
+    path = tmp_path / "in.png"
+    Image.linear_gradient("L").resize((120, 90)).convert("RGB").save(path)
+    settings = RenderSettings().replace(pixel_art_palette="None", grid_enabled=True, show_grid_numbers=True)
+    cache = StageCache()
+    cache.render(str(path), settings)
+    canvases = _count_calls(monkeypatch, plan.NumberCanvas, "apply")
+    upscales = _count_calls(monkeypatch, plan.PixelArt, "enlarge")
+
+    restyled = [settings.replace(grid_number_text_color="#FF0000"), settings.replace(grid_color="#00FF00")]
+    results = [cache.render(str(path), changed) for changed in restyled]
+
+    assert canvases == [] and upscales == []
+    for changed, (img, rows) in zip(restyled, results):
+        expected, expected_rows = render_image(str(path), changed)
+        assert rows == expected_rows
+        assert ImageChops.difference(img, expected).getbbox() is None